@@ -12,7 +12,7 @@ if errorlevel 1 (
 
 echo ✅ Python found
 echo Installing/checking Streamlit...
-pip install streamlit >nul 2>&1
+pip install "streamlit>=1.52" >nul 2>&1
 
 echo 🚀 Launching Guitar Tracker...
 echo.
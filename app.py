@@ -1,264 +1,423 @@
 import streamlit as st
-import sqlite3
 import datetime
+import functools
+import hashlib
+import html
+import io
+import os
+import threading
+import uuid
+from collections import OrderedDict
 from pathlib import Path
 
-# Database setup - Use user's home directory for database
-DB_PATH = Path.home() / "guitar_tracker.db"
-
-def migrate_database():
-    """Migrate database schema if needed"""
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    
-    # Check if header_text column exists
-    cursor.execute("PRAGMA table_info(goals)")
-    columns = [column[1] for column in cursor.fetchall()]
-    
-    # Add header_text column if it doesn't exist
-    if 'header_text' not in columns:
-        print("Migrating database: Adding header_text column...")
-        cursor.execute('ALTER TABLE goals ADD COLUMN header_text TEXT DEFAULT ""')
-        conn.commit()
-        print("Database migration completed!")
-    
-    conn.close()
-
-def init_database():
-    """Initialize the SQLite database with required tables"""
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    
-    # Goals table
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS goals (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            month INTEGER,
-            year INTEGER,
-            name TEXT,
-            description TEXT,
-            completion_criteria TEXT,
-            header_text TEXT DEFAULT "",
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        )
-    ''')
-    
-    # Tasks table
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS tasks (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            goal_id INTEGER,
-            task_description TEXT,
-            task_order INTEGER,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            FOREIGN KEY (goal_id) REFERENCES goals (id)
-        )
-    ''')
-    
-    # Journal entries table
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS journal_entries (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            goal_id INTEGER,
-            content TEXT,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            FOREIGN KEY (goal_id) REFERENCES goals (id)
-        )
-    ''')
+import diagnostics
+from autosave import get_queue as get_autosave_queue
+from db import MAX_OPEN_DATABASES, current_database, use_database
+from diagnostics import instrument
+from export_import import detect_format, export_to, import_from
+from storage import (DESCRIPTION_PREVIEW_CHARS, GOALS_PAGE_SIZE, JOURNAL_REVISION_PAGE_SIZE, JOURNAL_WINDOW_SIZE,
+                     PRACTICE_PERIODS,
+                     SEARCH_RESULT_LIMIT, get_storage, journal_date, practice_periods)
+from tenancy import database_for, resolve_user, tenancy_enabled
+
+# Maximum number of read results kept in memory
+READ_CACHE_SIZE = 512
+
+# Maximum number of goals whose edit state one session keeps
+GOAL_STATE_LIMIT = 8
+
+# How the goal page names the current day, week and month of practice
+PRACTICE_PERIOD_LABELS = {'day': "Today", 'week': "This week", 'month': "This month"}
+
+# Stylesheet of the app, and the folder Streamlit serves as app/static/
+STATIC_DIR = Path(__file__).resolve().parent / "static"
+STYLESHEET = STATIC_DIR / "guitar_tracker.css"
+
+class ReadCache:
+    """LRU cache in front of the goal, task and journal reads.
+
+    Goal-scoped entries are keyed by goal id plus that goal's version, and
+    list entries by a global version; writes bump both, so stale entries
+    become unreachable and age out of the LRU. Commits made by anything
+    else (another process, a manual edit) are noticed through the
+    storage's data_version() and drop the whole cache. Our own writes
+    move data_version too, so a write cannot tell from it whether another
+    writer committed in the meantime; instead it samples
+    others_data_version(), which ignores the writing connection's own
+    commits, before (begin_write()) and after (invalidate()) the write.
+    """
+    
+    def __init__(self, storage, max_entries=READ_CACHE_SIZE):
+        self.storage = storage
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._goal_versions = {}
+        self._version = 0
+        self._lock = threading.Lock()
+        self._data_version = storage.data_version()
+    
+    def _check_external_writes(self):
+        data_version = self.storage.data_version()
+        if data_version != self._data_version:
+            self._data_version = data_version
+            self._entries.clear()
+            self._version += 1
+    
+    def get(self, name, goal_id, args, loader):
+        """Return the cached result of a read, calling loader() on a miss"""
+        with self._lock:
+            self._check_external_writes()
+            if goal_id is None:
+                key = (name, None, args, self._version)
+            else:
+                key = (name, goal_id, args, self._goal_versions.get(goal_id, 0))
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key]
+            self.misses += 1
+        
+        # Load outside the lock; a write racing with this load bumps the
+        # version, so the result is stored under a key nobody asks for again
+        value = loader()
+        with self._lock:
+            self._entries[key] = value
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return value
+    
+    def begin_write(self):
+        """Sample others_data_version() before this thread writes; pass the result to invalidate()"""
+        with self._lock:
+            # Anything committed since the last read is someone else's
+            self._check_external_writes()
+        return self.storage.others_data_version()
+    
+    def invalidate(self, goal_id, before):
+        """Bump versions after this thread committed a write to goal_id.
+
+        before is what begin_write() returned; if others_data_version() has
+        moved since, someone else committed during the write and the whole
+        cache is dropped.
+        """
+        with self._lock:
+            self._goal_versions[goal_id] = self._goal_versions.get(goal_id, 0) + 1
+            self._version += 1
+            # data_version first: a commit landing between the two samples then shows up in
+            # others_data_version() now, or in data_version() at the next read
+            self._data_version = self.storage.data_version()
+            if self.storage.others_data_version() != before:
+                self._entries.clear()
+    
+    def clear(self):
+        """Drop every cached entry (the next read of everything goes to storage)"""
+        with self._lock:
+            self._entries.clear()
+            self._version += 1
+
+class GoalState:
+    """One session's edit state of one goal page"""
+    
+    __slots__ = ('tasks', 'num_tasks', 'journal_date', 'journal', 'journal_last_saved', 'journal_windows',
+                 'revision_pages')
+    
+    def __init__(self, tasks, entry_date, journal):
+        self.tasks = list(tasks) or [""]
+        self.num_tasks = len(self.tasks)
+        # Day of the journal entry being edited, and its text
+        self.journal_date = entry_date
+        self.journal = journal
+        self.journal_last_saved = journal
+        # Windows of earlier journal entries shown, and pages of journal history listed
+        self.journal_windows = 1
+        self.revision_pages = 1
+
+class GoalStates:
+    """Per-goal edit state of a session, with the least recently opened goals evicted.
     
-    conn.commit()
-    conn.close()
+    An evicted goal is loaded from storage again when it is next opened.
+    """
+    
+    def __init__(self, max_entries=GOAL_STATE_LIMIT):
+        self.max_entries = max_entries
+        self._states = OrderedDict()
+    
+    def get(self, goal_id, tasks, entry_date, journal):
+        """State of goal_id, created from the stored tasks and journal if not resident.
+
+        A state whose journal belongs to an earlier day is replaced too, so
+        yesterday's entry is never edited (and saved) as today's.
+        """
+        state = self._states.get(goal_id)
+        if state is None or state.journal_date != entry_date:
+            return self.reset(goal_id, tasks, entry_date, journal)
+        self._states.move_to_end(goal_id)
+        return state
+    
+    def reset(self, goal_id, tasks=(), entry_date=None, journal=""):
+        """Replace the state of goal_id with a fresh one (journal of entry_date, default today) and return it"""
+        state = self._states[goal_id] = GoalState(tasks, entry_date or journal_date(), journal)
+        self._states.move_to_end(goal_id)
+        while len(self._states) > self.max_entries:
+            self._states.popitem(last=False)
+        return state
+    
+    def __len__(self):
+        return len(self._states)
+
+def use_session_database():
+    """Point this thread's data access at the database main() resolved for the session.
+
+    Fragment reruns and widget callbacks run without main(), on a thread
+    that starts out on the shared DB_PATH, so each of them calls this first.
+    """
+    db_path = st.session_state.get('database')
+    if db_path is not None:
+        use_database(db_path)
+
+def get_goal_states():
+    """Per-goal edit state of the current session"""
+    if 'goal_states' not in st.session_state:
+        st.session_state.goal_states = GoalStates()
+    return st.session_state.goal_states
+
+@st.cache_resource(max_entries=MAX_OPEN_DATABASES)
+def _read_cache_for(db_path):
+    return ReadCache(get_storage())
+
+def get_read_cache():
+    """Read cache of the current database, shared by all sessions using it"""
+    return _read_cache_for(str(current_database()))
 
+def cached_read(per_goal):
+    """Serve a read function through the read cache.
+
+    With per_goal the first argument is the goal id and the entry is
+    invalidated by writes to that goal; otherwise by any write.
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            goal_id = (args[0] if args else kwargs['goal_id']) if per_goal else None
+            key_args = (args, tuple(sorted(kwargs.items())))
+            rows = get_read_cache().get(func.__name__, goal_id, key_args, lambda: func(*args, **kwargs))
+            # Hand out a fresh list so callers cannot mutate the cached rows
+            return list(rows) if type(rows) is tuple else rows
+        return wrapper
+    return decorator
+
+@instrument
 def get_current_goal():
     """Get or create goal for current month/year"""
-    now = datetime.datetime.now()
-    month, year = now.month, now.year
-    
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    
-    cursor.execute('SELECT * FROM goals WHERE month = ? AND year = ?', (month, year))
-    goal = cursor.fetchone()
-    
-    if not goal:
-        # Create new goal for this month
-        cursor.execute('''
-            INSERT INTO goals (month, year, name, description, completion_criteria, header_text)
-            VALUES (?, ?, "", "", "", "")
-        ''', (month, year))
-        conn.commit()
-        goal_id = cursor.lastrowid
-        goal = (goal_id, month, year, "", "", "", "", None, None)
-    
-    conn.close()
+    before = get_read_cache().begin_write()
+    goal = get_storage().get_current_goal()
+    get_read_cache().invalidate(goal[0], before)
     return goal
 
+@instrument
+@cached_read(per_goal=False)
 def get_all_goals():
     """Get all goals from database for landing page"""
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    
-    cursor.execute('SELECT * FROM goals ORDER BY year DESC, month DESC')
-    goals = cursor.fetchall()
-    
-    conn.close()
-    return goals
+    return tuple(get_storage().get_all_goals())
+
+@instrument
+@cached_read(per_goal=False)
+def get_goal_summaries(after=None, limit=GOALS_PAGE_SIZE):
+    """Get one page of goal summaries for the landing page, newest first.
+
+    Rows are (id, name, description_preview, created_at, year, month); the
+    preview is one character longer than DESCRIPTION_PREVIEW_CHARS when the
+    description was truncated. Pass the (year, month, id) key of the last
+    row seen as after to get the next page.
+    """
+    return tuple(get_storage().get_goal_summaries(after=after, limit=limit))
 
+@instrument
+def load_goal_bundle(goal_id, entry_date=None):
+    """Load a goal, its ordered tasks and the journal entry of entry_date (default today) as one snapshot.
+
+    Returns a GoalBundle (tasks as a tuple of rows), or None if the goal
+    does not exist.
+    """
+    return load_dated_goal_bundle(goal_id, entry_date or journal_date())
+
+@cached_read(per_goal=True)
+def load_dated_goal_bundle(goal_id, entry_date):
+    """load_goal_bundle() for the journal entry of entry_date, which is part of the cache key"""
+    return get_storage().load_goal_bundle(goal_id, entry_date)
+
+@instrument
 def get_goal_by_id(goal_id):
     """Get specific goal by ID"""
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    
-    cursor.execute('SELECT * FROM goals WHERE id = ?', (goal_id,))
-    goal = cursor.fetchone()
-    
-    conn.close()
-    return goal
+    bundle = load_goal_bundle(goal_id)
+    return bundle.goal if bundle else None
 
+@instrument
 def create_new_goal():
     """Create a new goal (not tied to any specific month)"""
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    
-    # Just create a new goal with current date for reference
-    now = datetime.datetime.now()
-    month, year = now.month, now.year
-    
-    # Create new goal - always creates a new one regardless of month
-    cursor.execute('''
-        INSERT INTO goals (month, year, name, description, completion_criteria, header_text)
-        VALUES (?, ?, "", "", "", "")
-    ''', (month, year))
-    conn.commit()
-    goal_id = cursor.lastrowid
-    
-    # Create initial empty journal entry for the new goal
-    cursor.execute('''
-        INSERT INTO journal_entries (goal_id, content)
-        VALUES (?, "")
-    ''', (goal_id,))
-    conn.commit()
-    
-    # Fetch the newly created goal
-    cursor.execute('SELECT * FROM goals WHERE id = ?', (goal_id,))
-    new_goal = cursor.fetchone()
-    
-    conn.close()
+    before = get_read_cache().begin_write()
+    new_goal = get_storage().create_goal()
+    get_read_cache().invalidate(new_goal[0], before)
     return new_goal
 
+@instrument
+def delete_goals(goal_ids):
+    """Complete (delete) several goals and all their data in one transaction"""
+    goal_ids = list(goal_ids)
+    if not goal_ids:
+        return
+    
+    before = get_read_cache().begin_write()
+    get_storage().delete_goals(goal_ids)
+    for goal_id in goal_ids:
+        get_read_cache().invalidate(goal_id, before)
+
+@instrument
 def delete_goal(goal_id):
     """Delete a goal and all associated data (tasks, journal entries)"""
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    
-    # Delete associated journal entries
-    cursor.execute('DELETE FROM journal_entries WHERE goal_id = ?', (goal_id,))
-    
-    # Delete associated tasks
-    cursor.execute('DELETE FROM tasks WHERE goal_id = ?', (goal_id,))
-    
-    # Delete the goal itself
-    cursor.execute('DELETE FROM goals WHERE id = ?', (goal_id,))
-    
-    conn.commit()
-    conn.close()
+    delete_goals([goal_id])
 
+@instrument
 def save_goal(goal_id, name, description, completion_criteria, header_text=None):
     """Save goal information"""
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    
-    if header_text is not None:
-        cursor.execute('''
-            UPDATE goals 
-            SET name = ?, description = ?, completion_criteria = ?, header_text = ?, updated_at = CURRENT_TIMESTAMP
-            WHERE id = ?
-        ''', (name, description, completion_criteria, header_text, goal_id))
-    else:
-        cursor.execute('''
-            UPDATE goals 
-            SET name = ?, description = ?, completion_criteria = ?, updated_at = CURRENT_TIMESTAMP
-            WHERE id = ?
-        ''', (name, description, completion_criteria, goal_id))
-    
-    conn.commit()
-    conn.close()
+    before = get_read_cache().begin_write()
+    get_storage().save_goal(goal_id, name, description, completion_criteria, header_text)
+    get_read_cache().invalidate(goal_id, before)
 
+@instrument
 def get_tasks(goal_id):
     """Get all tasks for a goal"""
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    
-    cursor.execute('SELECT * FROM tasks WHERE goal_id = ? ORDER BY task_order', (goal_id,))
-    tasks = cursor.fetchall()
-    
-    conn.close()
-    return tasks
+    bundle = load_goal_bundle(goal_id)
+    return list(bundle.tasks) if bundle else []
 
+@instrument
 def save_tasks(goal_id, tasks):
-    """Save tasks for a goal"""
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    
-    # Delete existing tasks
-    cursor.execute('DELETE FROM tasks WHERE goal_id = ?', (goal_id,))
-    
-    # Insert new tasks
-    for i, task in enumerate(tasks):
-        if task.strip():  # Only save non-empty tasks
-            cursor.execute('''
-                INSERT INTO tasks (goal_id, task_description, task_order)
-                VALUES (?, ?, ?)
-            ''', (goal_id, task.strip(), i))
-    
-    conn.commit()
-    conn.close()
+    """Save tasks for a goal, writing only the rows that changed.
+
+    Each task is stored under its slot position as task_order; empty slots
+    have no row.
+    """
+    before = get_read_cache().begin_write()
+    if get_storage().save_tasks(goal_id, tasks):
+        get_read_cache().invalidate(goal_id, before)
 
+@instrument
 def get_journal_content(goal_id):
-    """Get journal content for a goal"""
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    
-    cursor.execute('SELECT content FROM journal_entries WHERE goal_id = ? ORDER BY updated_at DESC LIMIT 1', (goal_id,))
-    result = cursor.fetchone()
-    
-    conn.close()
-    return result[0] if result else ""
+    """Get the text of today's journal entry for a goal"""
+    bundle = load_goal_bundle(goal_id)
+    return bundle.journal if bundle else ""
+
+@instrument
+@cached_read(per_goal=True)
+def get_journal_entries(goal_id, before):
+    """One window of earlier journal entries, newest first.
 
-def save_journal_content(goal_id, content):
-    """Save journal content"""
+    Rows are (entry_date, content) for up to JOURNAL_WINDOW_SIZE non-empty
+    entries dated before the before date.
+    """
+    return get_storage().get_journal_entries(goal_id, before)
+
+@instrument
+def get_journal_revisions(goal_id, limit=JOURNAL_REVISION_PAGE_SIZE):
+    """List the latest limit journal revisions for a goal, newest first.
+
+    Rows are (revision, entry_date, kind, stored size in bytes, created_at).
+    """
+    return get_storage().get_journal_revisions(goal_id, limit)
+
+@instrument
+def get_journal_revision(goal_id, revision):
+    """Rebuild the revised journal entry as it was at a given revision"""
+    return get_storage().get_journal_revision(goal_id, revision)
+
+@instrument
+def save_journal_content(goal_id, content, entry_date):
+    """Save the journal entry of entry_date, keeping the previous version in the revision history"""
     try:
-        conn = sqlite3.connect(DB_PATH)
-        cursor = conn.cursor()
-        
-        # Check if journal entry exists
-        cursor.execute('SELECT id FROM journal_entries WHERE goal_id = ?', (goal_id,))
-        existing = cursor.fetchone()
-        
-        if existing:
-            cursor.execute('''
-                UPDATE journal_entries 
-                SET content = ?, updated_at = CURRENT_TIMESTAMP
-                WHERE goal_id = ?
-            ''', (content, goal_id))
-            print(f"Updated journal for goal_id {goal_id}")
-        else:
-            cursor.execute('''
-                INSERT INTO journal_entries (goal_id, content)
-                VALUES (?, ?)
-            ''', (goal_id, content))
-            print(f"Inserted new journal for goal_id {goal_id}")
+        before = get_read_cache().begin_write()
+        if not get_storage().save_journal_content(goal_id, content, entry_date):
+            print(f"Journal for goal_id {goal_id} unchanged")
+            return
         
-        conn.commit()
-        conn.close()
+        get_read_cache().invalidate(goal_id, before)
         print(f"Journal saved successfully. Content length: {len(content)}")
     except Exception as e:
         print(f"Error saving journal: {e}")
 
+@instrument
+def log_practice_session(goal_id, started_at, minutes, task_id=None, tempo=None, notes=""):
+    """Log a practice session; the goal's day, week and month totals include it in the same write.
+
+    Returns the session id, or None when the goal no longer exists.
+    """
+    before = get_read_cache().begin_write()
+    session_id = get_storage().log_practice_session(goal_id, started_at, minutes, task_id, tempo, notes)
+    get_read_cache().invalidate(goal_id, before)
+    return session_id
+
+@instrument
+@cached_read(per_goal=True)
+def get_practice_rollups(goal_id, period, since):
+    """Practice totals of a goal per day, week or month, newest first.
+
+    Rows are (period_start, sessions, minutes) for each period from since
+    on with any practice logged.
+    """
+    return tuple(get_storage().get_practice_rollups(goal_id, period, since))
+
+@instrument
+def search_goals(text, limit=SEARCH_RESULT_LIMIT):
+    """Full-text search over goal names, descriptions, tasks and journals.
+
+    Returns (goal_id, name, kind, snippet_html) for the best match in each
+    goal, best goals first. kind is 'goal', 'task' or 'journal', and the
+    snippet is HTML-escaped with the matched words wrapped in <mark>.
+    """
+    return get_storage().search_goals(text, limit)
+
+def get_session_id():
+    """Stable id for this browser session, used to track its queued saves"""
+    if 'session_id' not in st.session_state:
+        st.session_state.session_id = uuid.uuid4().hex
+    return st.session_state.session_id
+
+def goal_card_html(goal_id, name, description, created_at, year, month):
+    """HTML of one landing-page goal card.
+
+    Built on every run: it is a few string operations, cheaper than
+    hashing the row into a cache key.
+    """
+    # Create a display name for the goal
+    if name and name.strip():
+        display_name = html.escape(name.strip())
+    else:
+        display_name = f"Untitled Goal #{goal_id}"
+    
+    # Format creation date
+    try:
+        date_str = datetime.datetime.strptime(created_at, '%Y-%m-%d %H:%M:%S').strftime('%B %d, %Y')
+    except (TypeError, ValueError):
+        date_str = datetime.date(year, month, 1).strftime('%B %Y')
+    
+    description_html = ""
+    if description:
+        # The summary preview is one character longer when the description was cut
+        preview = html.escape(description[:DESCRIPTION_PREVIEW_CHARS])
+        if len(description) > DESCRIPTION_PREVIEW_CHARS:
+            preview += "..."
+        description_html = f'<p class="goal-card-description">{preview}</p>'
+    
+    return (f'<div class="goal-card"><h3 class="goal-card-title">{display_name}</h3>'
+            f'{description_html}<p class="goal-card-date">Created: {date_str}</p></div>')
+
+@instrument
 def show_landing_page():
     """Display the landing page with all goals"""
+    # Anything still queued from the goal page is written before listing goals
+    get_autosave_queue().flush(get_session_id())
+    
     # Landing page header
     st.markdown("""
     <div class="month-header">
@@ -267,9 +426,15 @@ def show_landing_page():
     </div>
     """, unsafe_allow_html=True)
     
-    # Get all goals (fresh from database each time)
-    goals = get_all_goals()
+    # Keyset cursors of the pages above the current one (empty on the first page)
+    if 'landing_cursors' not in st.session_state:
+        st.session_state.landing_cursors = []
+    cursors = st.session_state.landing_cursors
     
+    # Fetch one extra row to know whether there is an older page
+    goals = get_goal_summaries(after=cursors[-1] if cursors else None, limit=GOALS_PAGE_SIZE + 1)
+    has_older = len(goals) > GOALS_PAGE_SIZE
+    goals = goals[:GOALS_PAGE_SIZE]
     
     # Add refresh button
     col1, col2 = st.columns([3, 1])
@@ -279,79 +444,55 @@ def show_landing_page():
         if st.button("🔄 Refresh", key="refresh_landing"):
             st.rerun()
     
-    if goals:
+    search_text = st.text_input(
+        "Search",
+        key="landing_search",
+        placeholder="🔍 Search goals, tasks and journals...",
+        label_visibility="collapsed"
+    )
+    
+    # Multi-select mode completes several goals at once
+    multi_select = st.checkbox("☑️ Select multiple goals", key="landing_multi_select")
+    if 'selected_goal_ids' not in st.session_state:
+        st.session_state.selected_goal_ids = set()
+    selected_goal_ids = st.session_state.selected_goal_ids
+    if not multi_select:
+        selected_goal_ids.clear()
+    
+    if search_text.strip():
+        show_search_results(search_text)
+    elif goals:
         # Display goals as clickable cards
-        for goal in goals:
-            goal_id, month, year, name, description, completion_criteria, header_text, created_at, updated_at = goal
-            
-            # Create a display name for the goal
-            if name and name.strip():
-                display_name = name.strip()
-            else:
-                display_name = f"Untitled Goal #{goal_id}"
-            
-            # Format creation date
-            if created_at:
-                try:
-                    created_date = datetime.datetime.strptime(created_at, '%Y-%m-%d %H:%M:%S')
-                    date_str = created_date.strftime('%B %d, %Y')
-                except:
-                    date_str = f"{datetime.date(year, month, 1).strftime('%B %Y')}"
-            else:
-                date_str = f"{datetime.date(year, month, 1).strftime('%B %Y')}"
+        # All card HTML is built up front; unchanged cards come from the memo
+        cards = [goal_card_html(*goal) for goal in goals]
+        for goal, card in zip(goals, cards):
+            goal_id, name = goal[0], goal[1]
+            display_name = name.strip() if name and name.strip() else f"Untitled Goal #{goal_id}"
             
-            # Create clickable goal card
             col1, col2 = st.columns([4, 1])
             
             with col1:
-                st.markdown(f"""
-                <div style="
-                    background-color: #faf9f7;
-                    padding: 1rem 1.5rem;
-                    border-radius: 10px;
-                    margin: 0.5rem 0;
-                    border: 1px solid #e8dcc0;
-                    cursor: pointer;
-                ">
-                    <h3 style="margin: 0; color: #6b5b47; font-size: 1.2rem;">{display_name}</h3>
-                    {f'<p style="margin: 0.5rem 0 0.5rem 0; color: #8b7355; font-size: 0.9rem;">{description[:100]}...</p>' if description and len(description) > 100 else f'<p style="margin: 0.5rem 0 0.5rem 0; color: #8b7355; font-size: 0.9rem;">{description}</p>' if description else ''}
-                    <p style="margin: 0; color: #a0956b; font-size: 0.8rem; font-style: italic;">
-                        Created: {date_str}
-                    </p>
-                </div>
-                """, unsafe_allow_html=True)
+                st.markdown(card, unsafe_allow_html=True)
             
             with col2:
+                if multi_select:
+                    # Selection lives in session state so it survives paging
+                    if st.checkbox("Select", value=goal_id in selected_goal_ids, key=f"select_goal_{goal_id}"):
+                        selected_goal_ids.add(goal_id)
+                    else:
+                        selected_goal_ids.discard(goal_id)
+                    continue
+                
                 if st.button("Open", key=f"open_goal_{goal_id}"):
                     st.session_state.current_page = "goal"
                     st.session_state.selected_goal_id = goal_id
                     st.rerun()
                 
-                # Small Complete button with confirmation (less prominent to avoid accidental clicks)
-                st.markdown("""
-                <style>
-                .tiny-complete-btn button {
-                    font-size: 0.6rem !important;
-                    padding: 0.1rem 0.3rem !important;
-                    background-color: #e0d6c0 !important;
-                    color: #8b7355 !important;
-                    border: 1px solid #d4c4a0 !important;
-                    min-height: 1.5rem !important;
-                    width: 2.5rem !important;
-                    border-radius: 3px !important;
-                }
-                .tiny-complete-btn button:hover {
-                    background-color: #d4c4a0 !important;
-                }
-                </style>
-                """, unsafe_allow_html=True)
-                
-                with st.container():
-                    st.markdown('<div class="tiny-complete-btn">', unsafe_allow_html=True)
-                    if st.button("✓", key=f"complete_goal_{goal_id}", help="Mark this goal as completed and delete it"):
-                        st.session_state[f'show_confirm_{goal_id}'] = True
-                        st.rerun()
-                    st.markdown('</div>', unsafe_allow_html=True)
+                # Small Complete button with confirmation (less prominent to avoid accidental clicks;
+                # styled through its key in apply_custom_css)
+                if st.button("✓", key=f"complete_goal_{goal_id}", help="Mark this goal as completed and delete it"):
+                    st.session_state[f'show_confirm_{goal_id}'] = True
+                    st.rerun()
                 
                 # Show confirmation dialog if delete was requested
                 if st.session_state.get(f'show_confirm_{goal_id}', False):
@@ -360,13 +501,33 @@ def show_landing_page():
                     with col_yes:
                         if st.button("Yes, Delete", key=f"confirm_yes_{goal_id}"):
                             delete_goal(goal_id)
-                            st.session_state[f'show_confirm_{goal_id}'] = False
+                            del st.session_state[f'show_confirm_{goal_id}']
                             st.success(f"Goal '{display_name}' completed and deleted!")
                             st.rerun()
                     with col_no:
                         if st.button("Cancel", key=f"confirm_no_{goal_id}"):
-                            st.session_state[f'show_confirm_{goal_id}'] = False
+                            del st.session_state[f'show_confirm_{goal_id}']
                             st.rerun()
+        
+        # Rendered after the checkboxes so the count includes this run's clicks
+        if multi_select:
+            show_batch_complete(selected_goal_ids)
+        
+        # Page through older goals on demand
+        col_newer, col_older = st.columns(2)
+        with col_newer:
+            if cursors and st.button("← Newer goals", key="landing_newer"):
+                cursors.pop()
+                st.rerun()
+        with col_older:
+            if has_older and st.button("Older goals →", key="landing_older"):
+                last_id, _, _, _, last_year, last_month = goals[-1]
+                cursors.append((last_year, last_month, last_id))
+                st.rerun()
+    elif cursors:
+        # The page we were on emptied out (e.g. its goals were completed)
+        cursors.pop()
+        st.rerun()
     else:
         st.info("No goal sheets yet. Click 'Create New Goal' to get started!")
     
@@ -377,299 +538,207 @@ def show_landing_page():
         new_goal_id = new_goal[0]
         st.session_state.current_page = "goal"
         st.session_state.selected_goal_id = new_goal_id
+        # Start the new goal with one empty task and an empty journal
+        get_goal_states().reset(new_goal_id)
+        st.rerun()
+    
+    show_export_import()
+
+def export_file(db_path, export_format):
+    """Export of every goal in a database, built only when the download is requested"""
+    # Streamlit builds deferred downloads outside the script thread, so the database is passed in
+    previous_database = current_database()
+    use_database(db_path)
+    try:
+        out = io.StringIO(newline="")
+        export_to(out, export_format, records=get_storage().iter_goal_records())
+        return out.getvalue()
+    finally:
+        use_database(previous_database)
+
+def show_export_import():
+    """Download an export of all goals, or import an export"""
+    with st.expander("📦 Export / Import"):
+        export_format = st.radio("Export format", ["jsonl", "csv"], horizontal=True, key="export_format")
+        timestamp = datetime.datetime.now().strftime('%Y%m%d_%H%M%S')
+        st.download_button(
+            "Export all goals",
+            data=functools.partial(export_file, current_database(), export_format),
+            file_name=f"guitar_tracker_export_{timestamp}.{export_format}",
+            mime="text/csv" if export_format == "csv" else "application/jsonl",
+            on_click="ignore",
+            key="export_goals"
+        )
         
-        # Clear ALL session state that might interfere with new goal initialization
-        keys_to_clear = ['tasks', 'num_tasks', 'journal_content']
-        for key in list(st.session_state.keys()):
-            if (key.startswith('task_') or 
-                key.startswith('journal_content_') or 
-                key.startswith('journal_last_saved_') or 
-                key.startswith('add_task_') or 
-                key.startswith('save_journal_') or 
-                key in keys_to_clear):
-                del st.session_state[key]
-        
-        # Initialize fresh session state for the new goal
-        st.session_state.num_tasks = 1
-        st.session_state.tasks = [""]
-        st.session_state[f'journal_content_{new_goal_id}'] = ""
-        st.session_state.journal_content = ""
-        # Initialize last saved state to empty (since it's a new goal with empty journal)
-        st.session_state[f'journal_last_saved_{new_goal_id}'] = ""
-        
+        uploaded = st.file_uploader("Import goals from an export file", type=["jsonl", "csv"], key="import_file")
+        if uploaded is not None and st.button("Import", key="import_goals"):
+            status = st.empty()
+            stream = io.TextIOWrapper(uploaded, encoding="utf-8", newline="")
+            errors = []
+            count = import_from(
+                stream,
+                detect_format(uploaded.name),
+                progress=lambda done: status.caption(f"⏳ Imported {done} goals..."),
+                importer=get_storage().import_records,
+                errors=errors
+            )
+            # The import wrote behind the read cache's back, and open goals hold their old text
+            get_read_cache().clear()
+            st.session_state.pop('goal_states', None)
+            status.success(f"✅ Imported {count} goals from {uploaded.name}")
+            for error in errors:
+                st.error(f"⚠️ {error}")
+
+def show_batch_complete(selected_goal_ids):
+    """Complete-selected button and confirmation for multi-select mode"""
+    count = len(selected_goal_ids)
+    if st.button(f"✓ Complete {count} selected goal{'s' if count != 1 else ''}", key="complete_selected", disabled=not count):
+        st.session_state.show_batch_confirm = True
         st.rerun()
+    
+    if st.session_state.get('show_batch_confirm', False) and count:
+        st.warning(f"⚠️ Are you sure you want to complete and delete {count} goal{'s' if count != 1 else ''}? This cannot be undone.")
+        col_yes, col_no = st.columns(2)
+        with col_yes:
+            if st.button("Yes, Delete", key="confirm_batch_yes"):
+                delete_goals(selected_goal_ids)
+                selected_goal_ids.clear()
+                st.session_state.pop('show_batch_confirm', None)
+                st.rerun()
+        with col_no:
+            if st.button("Cancel", key="confirm_batch_no"):
+                st.session_state.pop('show_batch_confirm', None)
+                st.rerun()
+
+def show_search_results(search_text):
+    """Display ranked search matches with highlighted snippets"""
+    results = search_goals(search_text)
+    if not results:
+        st.info(f"No goals match '{search_text.strip()}'.")
+        return
+    
+    kind_labels = {'goal': '🎯 Goal', 'task': '📋 Task', 'journal': '📝 Journal'}
+    for goal_id, name, kind, snippet_html in results:
+        display_name = html.escape(name.strip()) if name and name.strip() else f"Untitled Goal #{goal_id}"
+        col1, col2 = st.columns([4, 1])
+        with col1:
+            st.markdown(
+                f'<div class="goal-card"><h3 class="goal-card-title">{display_name}</h3>'
+                f'<p class="goal-card-description"><span class="goal-card-kind">{kind_labels.get(kind, kind)}:</span> {snippet_html}</p></div>',
+                unsafe_allow_html=True
+            )
+        with col2:
+            if st.button("Open", key=f"search_open_goal_{goal_id}"):
+                st.session_state.current_page = "goal"
+                st.session_state.selected_goal_id = goal_id
+                st.rerun()
 
+@st.cache_resource(show_spinner=False)
+def published_stylesheet():
+    """File name of the content-hashed copy of STYLESHEET in STATIC_DIR.
+    
+    The name changes whenever the stylesheet does, so browsers can keep
+    it cached. Returns None when the copy cannot be written. Published
+    once per server process, not once per rerun.
+    """
+    css = STYLESHEET.read_bytes()
+    name = f"{STYLESHEET.stem}.{hashlib.sha256(css).hexdigest()[:12]}.css"
+    published = STATIC_DIR / name
+    try:
+        if not published.exists():
+            # Write then rename so the server never serves half a file
+            temporary = published.with_name(f"{name}.tmp")
+            temporary.write_bytes(css)
+            os.replace(temporary, published)
+            for stale in STATIC_DIR.glob(f"{STYLESHEET.stem}.*.css"):
+                if stale != published:
+                    stale.unlink(missing_ok=True)
+    except OSError as e:
+        print(f"Error publishing stylesheet to {STATIC_DIR}: {e}")
+        return None
+    return name
+
+@instrument
 def apply_custom_css():
-    """Apply custom CSS for earth tone styling"""
-    st.markdown("""
-    <style>
-    .main {
-        background-color: #f5f2e8;
-    }
-    
-    .stApp {
-        background-color: #f5f2e8;
-    }
-    
-    .stApp > header {
-        background-color: transparent;
-    }
-    
-    .month-header {
-        background: linear-gradient(90deg, #8b7355 0%, #a0956b 100%);
-        color: white;
-        padding: 1.5rem;
-        border-radius: 10px;
-        text-align: center;
-        margin-bottom: 2rem;
-        box-shadow: 0 4px 6px rgba(0, 0, 0, 0.1);
-    }
-    
-    .month-title {
-        font-size: 2.5rem;
-        font-weight: 300;
-        margin: 0;
-        letter-spacing: 2px;
-    }
-    
-    .header-quote {
-        font-size: 0.9rem;
-        font-weight: 300;
-        margin: 0.5rem 0 0 0;
-        color: rgba(255, 255, 255, 0.8);
-        font-style: italic;
-        letter-spacing: 0.5px;
-    }
-    
-    /* Header text input styling */
-    .header-input {
-        background: transparent !important;
-        border: 2px solid rgba(255, 255, 255, 0.3) !important;
-        border-radius: 10px !important;
-        color: white !important;
-        font-size: 2.5rem !important;
-        font-weight: 300 !important;
-        letter-spacing: 2px !important;
-        text-align: center !important;
-        padding: 0.5rem 1rem !important;
-        margin: 0 !important;
-        width: 100% !important;
-    }
-    
-    .header-input:focus {
-        border-color: rgba(255, 255, 255, 0.6) !important;
-        box-shadow: 0 0 0 2px rgba(255, 255, 255, 0.2) !important;
-        outline: none !important;
-    }
-    
-    .header-input::placeholder {
-        color: rgba(255, 255, 255, 0.7) !important;
-    }
-    
-    .section-header {
-        color: #6b5b47;
-        font-size: 1.2rem;
-        font-weight: 600;
-        margin-bottom: 1rem;
-        padding-bottom: 0.5rem;
-        border-bottom: 2px solid #d4c4a0;
-    }
-    
-    .stTextInput > div > div > input {
-        background-color: #faf9f7;
-        border: 1px solid #d4c4a0;
-        border-radius: 5px;
-        color: #4a4035;
-    }
-    
-    /* Goal name input specific styling - match section header */
-    .goal-name-section input {
-        font-size: 1.2rem !important;
-        color: #6b5b47 !important;
-        font-weight: 600 !important;
-        height: 80px !important;
-    }
-    
-    .goal-name-section .stTextInput > div > div > input {
-        font-size: 1.2rem !important;
-        color: #6b5b47 !important;
-        font-weight: 600 !important;
-        height: 80px !important;
-    }
-    
-    .goal-name-section div[data-testid="stTextInput"] input {
-        font-size: 1.2rem !important;
-        color: #6b5b47 !important;
-        font-weight: 600 !important;
-        height: 80px !important;
-    }
-    
-    .stTextArea > div > div > textarea {
-        background-color: #faf9f7;
-        border: 1px solid #d4c4a0;
-        border-radius: 5px;
-        color: #4a4035;
-        font-family: 'Georgia', serif;
-    }
-    
-    .stButton > button {
-        background-color: #8b7355;
-        color: white;
-        border-radius: 20px;
-        border: none;
-        padding: 0.5rem 1rem;
-        font-weight: 500;
-        transition: all 0.3s ease;
-    }
-    
-    .stButton > button:hover {
-        background-color: #6b5b47;
-        transform: translateY(-1px);
-        box-shadow: 0 2px 4px rgba(0, 0, 0, 0.2);
-    }
-    
-    .task-section {
-        background-color: #faf9f7;
-        padding: 1.5rem;
-        border-radius: 10px;
-        margin: 1rem 0;
-        border: 1px solid #e8dcc0;
-    }
-    
-    .journal-section {
-        background-color: #f9f7f4;
-        padding: 1.5rem;
-        border-radius: 10px;
-        margin: 1rem 0;
-        border: 1px solid #e8dcc0;
-        min-height: 400px;
-    }
-    
-    .add-task-btn {
-        display: inline-flex;
-        align-items: center;
-        justify-content: center;
-        width: 40px;
-        height: 40px;
-        border-radius: 50%;
-        background-color: #a0956b;
-        color: white;
-        font-size: 1.5rem;
-        font-weight: bold;
-        border: none;
-        cursor: pointer;
-        margin: 0.5rem 0;
-    }
-    </style>
-    """, unsafe_allow_html=True)
+    """Apply custom CSS for earth tone styling.
+    
+    With static file serving on, each rerun only sends an @import of the
+    cached stylesheet; otherwise the stylesheet is sent inline.
+    """
+    name = published_stylesheet() if st.get_option("server.enableStaticServing") else None
+    if name is None:
+        st.html(STYLESHEET)
+    else:
+        st.html(f'<style>@import url("app/static/{name}");</style>')
 
+@instrument
 def show_goal_page(goal_id=None):
     """Display the goal page for a specific goal or current month"""
     # Goal page rendering
     
     # Get goal - either specific goal or current month goal
-    if goal_id:
-        goal = get_goal_by_id(goal_id)
-        if not goal:
-            st.error("Goal not found!")
-            return
-    else:
-        goal = get_current_goal()
-        goal_id = goal[0]
-    
-    # Initialize session state for tasks - only if not already set for this goal
-    existing_tasks = get_tasks(goal_id)
-    
-    # Check if this is a different goal or first time initialization
-    current_goal_key = f'current_goal_id_{goal_id}'
-    if (current_goal_key not in st.session_state or 
-        st.session_state.get('selected_goal_id') != goal_id or
-        'num_tasks' not in st.session_state):
-        
-        # Initialize from database
-        st.session_state.num_tasks = len(existing_tasks) if existing_tasks else 1
-        st.session_state.tasks = [task[2] for task in existing_tasks] if existing_tasks else [""]
-        st.session_state[current_goal_key] = goal_id
-    
-    # Ensure tasks list is properly sized (always do this)
-    while len(st.session_state.tasks) < st.session_state.num_tasks:
-        st.session_state.tasks.append("")
+    if not goal_id:
+        goal_id = get_current_goal()[0]
     
-    # Initialize journal content for this goal - always ensure it exists
-    # Get fresh content from database each time
-    journal_from_db = get_journal_content(goal_id)
+    # Goal, tasks and journal come from one snapshot (usually straight from the read cache)
+    today = journal_date()
+    bundle = load_goal_bundle(goal_id, today)
+    if not bundle:
+        st.error("Goal not found!")
+        return
+    _, existing_tasks, journal_from_db = bundle
     
-    # Initialize session state for this goal if not set
-    journal_key = f'journal_content_{goal_id}'
-    if journal_key not in st.session_state:
-        st.session_state[journal_key] = journal_from_db
-    
-    # Initialize "last saved" tracking for save status
-    last_saved_key = f'journal_last_saved_{goal_id}'
-    if last_saved_key not in st.session_state:
-        st.session_state[last_saved_key] = journal_from_db
-    
-    # Always set the current journal content
-    st.session_state.journal_content = st.session_state.get(journal_key, journal_from_db)
+    # This session's edit state of the goal, loaded from the database on first visit and each new day
+    state = get_goal_states().get(goal_id, [task[2] for task in existing_tasks], today, journal_from_db)
     
     # Navigation button back to landing page
     if st.button("← Back to All Goals", key="back_to_landing"):
+        get_autosave_queue().flush(get_session_id())
         st.session_state.current_page = "landing"
         # Clear selected goal ID
         if 'selected_goal_id' in st.session_state:
             del st.session_state.selected_goal_id
         st.rerun()
     
-    # Dynamic Header Section - shows goal name or fallback to date
-    goal_name_from_db = goal[3] if goal[3] else ""
-    header_text = goal_name_from_db.strip() if goal_name_from_db.strip() else datetime.datetime.now().strftime("%B %Y")
-    st.markdown(f"""
-    <div class="month-header">
-        <h1 class="month-title">{header_text}</h1>
-        <p class="header-quote">"The guitar is a small orchestra. It is polyphonic. Every string is a different color, a different voice." - Andrés Segovia 🎸</p>
-    </div>
-    """, unsafe_allow_html=True)
+    # Each section is a fragment, so an edit only reruns (and resends) its own section
+    show_goal_form(goal_id)
+    st.markdown("---")
+    show_tasks(goal_id, state)
+    st.markdown("---")
+    show_practice_log(goal_id)
+    st.markdown("---")
+    show_journal(goal_id, state)
+    
+    # Footer info
+    st.markdown("---")
+    st.markdown(
+        '<div style="text-align: center; color: #8b7355; font-style: italic; padding: 1rem;">🎸 Your classical guitar learning journey - one day at a time 🎸</div>',
+        unsafe_allow_html=True
+    )
+
+@st.fragment
+@instrument
+def show_goal_form(goal_id):
+    """Goal header, name and description; edits are autosaved"""
+    use_session_database()
+    bundle = load_goal_bundle(goal_id)
+    if not bundle:
+        return
+    goal = bundle.goal
+    
+    # Show edits that are queued but not yet written as if they were saved
+    autosave_queue = get_autosave_queue()
+    pending_goal = autosave_queue.pending_args(('goal', goal_id))
+    if pending_goal:
+        _, name, description, criteria = pending_goal
+        goal = goal[:3] + (name, description, criteria) + goal[6:]
+    
+    # Dynamic Header Section - filled in below, once the name input has been read
+    header = st.empty()
     
     # Goal Input Section
     st.markdown('<div class="section-header">🎯 S.M.A.R.T Goal</div>', unsafe_allow_html=True)
     
-    # Apply inline style directly to the text input
-    st.markdown("""
-    <style>
-    /* Use very specific selectors to override Streamlit defaults */
-    div[data-testid="stTextInput"]:has(input[aria-label="Goal Name"]) input,
-    .stTextInput:has(input[aria-label="Goal Name"]) input,
-    input[aria-label="Goal Name"] {
-        font-size: 1.2rem !important;
-        color: #6b5b47 !important;
-        font-weight: 600 !important;
-        height: 80px !important;
-        line-height: normal !important;
-        padding: 0 10px !important;
-        margin: 0 !important;
-        text-align: left !important;
-        box-sizing: border-box !important;
-        transform: translateY(-17px) !important;
-        position: relative !important;
-    }
-    
-    /* Fallback with element attribute selector */
-    input[placeholder*="Bach"] {
-        font-size: 1.2rem !important;
-        color: #6b5b47 !important;
-        font-weight: 600 !important;
-        height: 80px !important;
-        line-height: normal !important;
-        padding: 0 10px !important;
-        margin: 0 !important;
-        text-align: left !important;
-        box-sizing: border-box !important;
-        transform: translateY(-17px) !important;
-        position: relative !important;
-    }
-    </style>
-    """, unsafe_allow_html=True)
-    
     goal_name = st.text_input(
         "Goal Name",
         value=goal[3],
@@ -678,28 +747,6 @@ def show_goal_page(goal_id=None):
         key="goal_name_input"
     )
     
-    # JavaScript injection to force styling if CSS fails
-    st.markdown("""
-    <script>
-    setTimeout(function() {
-        const goalInput = document.querySelector('input[placeholder*="Bach"]');
-        if (goalInput) {
-            goalInput.style.fontSize = '1.2rem';
-            goalInput.style.color = '#6b5b47';
-            goalInput.style.fontWeight = '600';
-            goalInput.style.height = '80px';
-            goalInput.style.lineHeight = 'normal';
-            goalInput.style.padding = '0 10px';
-            goalInput.style.margin = '0';
-            goalInput.style.textAlign = 'left';
-            goalInput.style.boxSizing = 'border-box';
-            goalInput.style.transform = 'translateY(-17px)';
-            goalInput.style.position = 'relative';
-        }
-    }, 1000);
-    </script>
-    """, unsafe_allow_html=True)
-    
     goal_description = st.text_area(
         "Goal Description & Completion Criteria",
         value=f"{goal[4]}\n\n{goal[5]}" if goal[4] or goal[5] else "",
@@ -708,6 +755,15 @@ def show_goal_page(goal_id=None):
         help="What exactly do you want to achieve and how will you know you've succeeded?"
     )
     
+    # Header shows the goal name as typed, or falls back to the date
+    header_text = goal_name.strip() if goal_name.strip() else datetime.datetime.now().strftime("%B %Y")
+    header.markdown(f"""
+    <div class="month-header">
+        <h1 class="month-title">{header_text}</h1>
+        <p class="header-quote">"The guitar is a small orchestra. It is polyphonic. Every string is a different color, a different voice." - Andrés Segovia 🎸</p>
+    </div>
+    """, unsafe_allow_html=True)
+    
     # Auto-save goal when changed - but avoid infinite loops with empty values
     goal_desc_comparison = f"{goal[4]}\n\n{goal[5]}" if goal[4] or goal[5] else ""
     
@@ -723,30 +779,38 @@ def show_goal_page(goal_id=None):
         desc_parts = goal_description.split('\n\n', 1)
         description = desc_parts[0] if len(desc_parts) > 0 else ""
         criteria = desc_parts[1] if len(desc_parts) > 1 else ""
-        save_goal(goal_id, goal_name, description, criteria)
-        # Force refresh of goal data
-        st.rerun()
-    
-    st.markdown("---")
+        autosave_queue.submit(get_session_id(), ('goal', goal_id), save_goal, goal_id, goal_name, description, criteria)
+
+def add_task(goal_id, state):
+    """Add an empty task slot to the goal"""
+    use_session_database()
+    if state.num_tasks < 5:
+        state.num_tasks += 1
+        state.tasks.append("")
+        # Save the updated task structure to prevent loss on rerun
+        get_autosave_queue().submit(get_session_id(), ('tasks', goal_id), save_tasks, goal_id, list(state.tasks))
+
+@st.fragment
+@instrument
+def show_tasks(goal_id, state):
+    """Practice task inputs, the Add Task button and the autosave status"""
+    use_session_database()
+    autosave_queue = get_autosave_queue()
     
     # Tasks Section
     st.markdown('<div class="section-header">📋 Practice Tasks</div>', unsafe_allow_html=True)
     
     
     # Debug info (remove after testing)
-    # st.write(f"Debug: num_tasks = {st.session_state.num_tasks}, tasks = {st.session_state.tasks}")
-    
-    # Ensure we have at least one task slot
-    if st.session_state.num_tasks < 1:
-        st.session_state.num_tasks = 1
+    # st.write(f"Debug: num_tasks = {state.num_tasks}, tasks = {state.tasks}")
     
     # Ensure tasks list is properly sized
-    while len(st.session_state.tasks) < st.session_state.num_tasks:
-        st.session_state.tasks.append("")
+    while len(state.tasks) < state.num_tasks:
+        state.tasks.append("")
     
     # Display task input fields
-    for i in range(st.session_state.num_tasks):
-        task_value = st.session_state.tasks[i] if i < len(st.session_state.tasks) else ""
+    for i in range(state.num_tasks):
+        task_value = state.tasks[i]
         
         new_task = st.text_input(
             f"Task {i+1}",
@@ -757,41 +821,108 @@ def show_goal_page(goal_id=None):
         
         if new_task != task_value:
             # Update the tasks list
-            if i >= len(st.session_state.tasks):
-                st.session_state.tasks.extend([""] * (i - len(st.session_state.tasks) + 1))
-            st.session_state.tasks[i] = new_task
-            save_tasks(goal_id, st.session_state.tasks)
+            state.tasks[i] = new_task
+            autosave_queue.submit(get_session_id(), ('tasks', goal_id), save_tasks, goal_id, list(state.tasks))
     
     # Add task button (only show if less than 5 tasks)
-    if st.session_state.num_tasks < 5:
-        add_task_key = f"add_task_{goal_id}"
-        if st.button("➕ Add Task", key=add_task_key):
-            # Ensure we don't exceed the list bounds
-            if st.session_state.num_tasks < 5:
-                st.session_state.num_tasks += 1
-                # Ensure tasks list is properly sized
-                while len(st.session_state.tasks) < st.session_state.num_tasks:
-                    st.session_state.tasks.append("")
-                # Save the updated task structure to prevent loss on rerun
-                save_tasks(goal_id, st.session_state.tasks)
-                st.rerun()
-    
-    st.markdown("---")
-    
+    if state.num_tasks < 5:
+        # Runs as a callback, before the section reruns, so the new input shows without another rerun
+        st.button("➕ Add Task", key=f"add_task_{goal_id}", on_click=add_task, args=(goal_id, state))
+    
+    # Autosave status for this session
+    pending, flushed, error = autosave_queue.status(get_session_id())
+    if error:
+        st.warning(f"⚠️ Auto-save failed, retrying: {error}" if pending else f"⚠️ Auto-save failed: {error}")
+    elif pending:
+        st.caption(f"💾 Saving {pending} change{'s' if pending != 1 else ''}...")
+    elif flushed:
+        st.caption("✅ All changes saved")
+
+def log_practice(goal_id):
+    """Log the session entered in the practice form"""
+    use_session_database()
+    values = st.session_state
+    started_at = datetime.datetime.combine(values[f"practice_date_{goal_id}"], values[f"practice_time_{goal_id}"])
+    minutes = values[f"practice_minutes_{goal_id}"]
+    session_id = log_practice_session(
+        goal_id,
+        started_at.strftime('%Y-%m-%d %H:%M:%S'),
+        minutes,
+        task_id=values[f"practice_task_{goal_id}"],
+        tempo=values[f"practice_tempo_{goal_id}"],
+        notes=values[f"practice_notes_{goal_id}"].strip()
+    )
+    if session_id is None:
+        # Shown by show_practice_log, which reruns right after this callback
+        st.session_state[f"practice_error_{goal_id}"] = "This goal was deleted, so the session was not logged."
+    else:
+        st.toast(f"✅ Logged {minutes} minutes of practice")
+
+@st.fragment
+@instrument
+def show_practice_log(goal_id):
+    """Form logging a practice session, and the practice time of this day, week and month"""
+    use_session_database()
+    st.markdown('<div class="section-header">⏱️ Practice Log</div>', unsafe_allow_html=True)
+    
+    bundle = load_goal_bundle(goal_id)
+    task_names = {task[0]: task[2] for task in bundle.tasks} if bundle else {}
+    
+    # The form sends nothing until it is submitted, and logging is a single insert
+    with st.form(f"practice_form_{goal_id}", clear_on_submit=True, border=False):
+        date_col, time_col, minutes_col = st.columns(3)
+        with date_col:
+            st.date_input("Date", key=f"practice_date_{goal_id}")
+        with time_col:
+            st.time_input("Started at", step=300, key=f"practice_time_{goal_id}")
+        with minutes_col:
+            st.number_input("Minutes", min_value=1, max_value=600, value=30, step=5, key=f"practice_minutes_{goal_id}")
+        task_col, tempo_col = st.columns([2, 1])
+        with task_col:
+            st.selectbox(
+                "Task",
+                [None, *task_names],
+                format_func=lambda task_id: task_names.get(task_id, "General practice"),
+                key=f"practice_task_{goal_id}"
+            )
+        with tempo_col:
+            st.number_input("Tempo (BPM)", min_value=20, max_value=300, value=None, step=4,
+                            placeholder="Optional", key=f"practice_tempo_{goal_id}")
+        st.text_input("Notes", placeholder="e.g., clean shifts at bar 12", key=f"practice_notes_{goal_id}")
+        st.form_submit_button("⏱️ Log Session", on_click=log_practice, args=(goal_id,))
+    error = st.session_state.pop(f"practice_error_{goal_id}", None)
+    if error:
+        st.error(f"⚠️ {error}")
+    
+    # Each total is one rollup row, compared with the period before it
+    current = practice_periods(journal_date())
+    for column, period in zip(st.columns(len(PRACTICE_PERIODS)), PRACTICE_PERIODS):
+        previous = practice_periods(datetime.date.fromisoformat(current[period]) - datetime.timedelta(days=1))[period]
+        totals = {start: (sessions, minutes) for start, sessions, minutes in get_practice_rollups(goal_id, period, previous)}
+        sessions, minutes = totals.get(current[period], (0, 0))
+        previous_minutes = totals.get(previous, (0, 0))[1]
+        column.metric(
+            PRACTICE_PERIOD_LABELS[period],
+            f"{minutes} min",
+            delta=f"{minutes - previous_minutes:+d} min" if minutes or previous_minutes else None,
+            help=f"{sessions} session{'s' if sessions != 1 else ''}"
+        )
+
+@st.fragment
+@instrument
+def show_journal(goal_id, state):
+    """Today's journal entry, earlier entries a window at a time, and the revision history"""
+    use_session_database()
     # Journal Section
     st.markdown('<div class="section-header">📝 Practice Journal</div>', unsafe_allow_html=True)
     
-    # Ensure we always have a journal content value - use multiple fallbacks
-    current_journal_value = st.session_state.get('journal_content', '')
-    if not current_journal_value:
-        # Fallback to goal-specific session state
-        journal_key = f'journal_content_{goal_id}'
-        current_journal_value = st.session_state.get(journal_key, '')
-    
-    # Always render the journal text area
+    # Only today's entry is editable, so the text sent back and forth stays one day long.
+    # The text area is keyed by the day, so a new day starts a fresh widget
+    today = state.journal_date
+    st.caption(f"Today's entry - {datetime.date.fromisoformat(today).strftime('%A, %B %d, %Y')}")
     new_journal_content = st.text_area(
         "Daily Practice Reflections",
-        value=current_journal_value,
+        value=state.journal,
         height=400,
         placeholder="""Record your daily practice sessions here...
 |
@@ -804,31 +935,82 @@ def show_goal_page(goal_id=None):
 This is your personal space for reflection and growth.""",
         help="This is the heart of your tracker - write freely about your practice journey. Save status updates when you click outside this text area.",
         label_visibility="collapsed",
-        key=f"journal_text_area_{goal_id}"
+        key=f"journal_text_area_{goal_id}_{today}"
     )
     
     # Note: Save status updates when text area loses focus (standard Streamlit behavior)
     
     # Manual save button
     if st.button("💾 Save Journal", key=f"save_journal_{goal_id}"):
-        # Save to both goal-specific and general session state
-        journal_key = f'journal_content_{goal_id}'
-        st.session_state.journal_content = new_journal_content
-        st.session_state[journal_key] = new_journal_content
-        # Save to database
-        save_journal_content(goal_id, new_journal_content)
+        state.journal = new_journal_content
+        # The day the page was loaded for, even if the click comes after midnight
+        save_journal_content(goal_id, new_journal_content, today)
         # Update the "last saved" state to match current content
-        st.session_state[f'journal_last_saved_{goal_id}'] = new_journal_content
+        state.journal_last_saved = new_journal_content
+        # Cleared by the next rerun of this section
         st.success("✅ Journal saved successfully!")
-        st.rerun()  # Refresh to clear the success message
     
-    # Footer info
-    st.markdown("---")
-    st.markdown(
-        '<div style="text-align: center; color: #8b7355; font-style: italic; padding: 1rem;">🎸 Your classical guitar learning journey - one day at a time 🎸</div>',
-        unsafe_allow_html=True
-    )
+    show_earlier_journal_entries(goal_id, state, today)
+    
+    # Past versions of the journal (only queried while the history is shown)
+    if st.checkbox("🕘 Show journal history", key=f"show_journal_history_{goal_id}"):
+        limit = JOURNAL_REVISION_PAGE_SIZE * state.revision_pages
+        revisions = get_journal_revisions(goal_id, limit)
+        if revisions:
+            labels = {revision: f"Revision {revision} - {entry_date} entry, saved {created_at}"
+                      for revision, entry_date, _, _, created_at in revisions}
+            selected_revision = st.selectbox(
+                "Version",
+                list(labels),
+                format_func=labels.get,
+                key=f"journal_revision_{goal_id}"
+            )
+            st.text_area(
+                "Entry at this version",
+                value=get_journal_revision(goal_id, selected_revision),
+                height=300,
+                disabled=True,
+                key=f"journal_revision_text_{goal_id}_{selected_revision}"
+            )
+            if len(revisions) == limit:
+                st.button("⬇️ Show older versions", key=f"older_journal_revisions_{goal_id}",
+                          on_click=show_older_journal_revisions, args=(state,))
+        else:
+            st.caption("No saved versions yet - history starts with your next journal save.")
+
+def show_older_journal_revisions(state):
+    """List one more page of journal history"""
+    use_session_database()
+    state.revision_pages += 1
 
+def show_older_journal_entries(state):
+    """Show one more window of earlier journal entries"""
+    use_session_database()
+    state.journal_windows += 1
+
+def journal_entry_html(entry_date, content):
+    """HTML of one read-only journal entry"""
+    day = datetime.date.fromisoformat(entry_date).strftime('%A, %B %d, %Y')
+    return (f'<div class="journal-entry"><div class="journal-entry-date">{day}</div>'
+            f'<div class="journal-entry-text">{html.escape(content)}</div></div>')
+
+def show_earlier_journal_entries(goal_id, state, today):
+    """Earlier entries, newest first, in as many windows as the student asked for"""
+    before, shown = today, 0
+    for _ in range(state.journal_windows):
+        entries = get_journal_entries(goal_id, before)
+        if entries:
+            st.markdown(''.join(journal_entry_html(*entry) for entry in entries), unsafe_allow_html=True)
+            shown += len(entries)
+            before = entries[-1][0]
+        if len(entries) < JOURNAL_WINDOW_SIZE:
+            if not shown:
+                st.caption("Entries from earlier days will appear here.")
+            return
+    st.button("⬇️ Show older entries", key=f"older_journal_entries_{goal_id}",
+              on_click=show_older_journal_entries, args=(state,))
+
+@instrument
 def main():
     """Main function with page navigation"""
     st.set_page_config(
@@ -841,11 +1023,17 @@ def main():
     # Apply custom styling
     apply_custom_css()
     
-    # Initialize database
-    init_database()
+    # Each student gets their own database when tenancy is enabled
+    user = resolve_user(st.query_params, st.context.headers)
+    if tenancy_enabled() and user is None:
+        st.error("🔒 No student identity was provided, so there is no tracker to open.")
+        return
+    # Kept in the session so fragment reruns and callbacks use the same database
+    st.session_state.database = str(database_for(user))
+    use_session_database()
     
-    # Run database migration if needed
-    migrate_database()
+    # Open the configured storage (creates or upgrades the schema on first use)
+    get_storage()
     
     # Initialize page state
     if 'current_page' not in st.session_state:
@@ -858,5 +1046,69 @@ def main():
         goal_id = st.session_state.get('selected_goal_id', None)
         show_goal_page(goal_id)
 
+def widget_fingerprints():
+    """Hash of every session state value, to spot which widget changed between reruns"""
+    return {key: hash(repr(value)) for key, value in st.session_state.items()
+            if not key.startswith('_diagnostics')}
+
+def get_rerun_cause():
+    """Best guess at what started this rerun"""
+    if st.session_state.get('_diagnostics_rerun_requested'):
+        st.session_state._diagnostics_rerun_requested = False
+        return "st.rerun"
+    snapshot = st.session_state.get('_diagnostics_widget_snapshot')
+    if snapshot is None:
+        return "session start"
+    for key, fingerprint in widget_fingerprints().items():
+        if key in snapshot and snapshot[key] != fingerprint:
+            return f"widget:{key}"
+    # Widgets without a key (and browser reloads) leave no trace in session state
+    return "browser or unkeyed widget"
+
+def show_diagnostics(traces):
+    """Sidebar with the timings of this interaction's reruns"""
+    with st.sidebar:
+        if not st.toggle("🩺 Diagnostics", value=True, key="diagnostics_visible"):
+            return
+        total_ms = sum(trace.ms for trace in traces)
+        st.caption(f"{len(traces)} rerun{'s' if len(traces) != 1 else ''} · {total_ms:.1f} ms · "
+                   f"{sum(trace.queries for trace in traces)} queries · {sum(trace.rows for trace in traces)} rows")
+        for trace in traces:
+            st.markdown(f"**{trace.cause}** → {trace.outcome} in {trace.ms:.1f} ms")
+            st.dataframe(
+                [{'function': '· ' * span.depth + span.name, 'ms': round(span.ms, 2),
+                  'queries': span.queries, 'rows': span.rows} for span in trace.spans if span],
+                hide_index=True
+            )
+        st.caption(f"Prometheus metrics: {diagnostics.METRICS_FILE}")
+
+def run_with_diagnostics():
+    """Run main() inside a rerun trace and show its timings in the sidebar"""
+    trace, token = diagnostics.start_rerun(get_rerun_cause())
+    outcome = "error"
+    try:
+        main()
+        outcome = "completed"
+    except BaseException as e:
+        # st.rerun() and st.stop() end the script by raising; the classes
+        # live in a private module, so they are recognised by name
+        if type(e).__name__ == "RerunException":
+            outcome = "rerun"
+            st.session_state._diagnostics_rerun_requested = True
+        elif type(e).__name__ == "StopException":
+            outcome = "stopped"
+        raise
+    finally:
+        diagnostics.finish_rerun(trace, token, outcome)
+        st.session_state._diagnostics_widget_snapshot = widget_fingerprints()
+        # Reruns requested with st.rerun() are shown with the run that follows them
+        chain = st.session_state.setdefault('_diagnostics_chain', [])
+        chain.append(trace)
+    st.session_state._diagnostics_chain = []
+    show_diagnostics(chain)
+
 if __name__ == "__main__":
-    main()
+    if diagnostics.ENABLED:
+        run_with_diagnostics()
+    else:
+        main()
@@ -0,0 +1,152 @@
+"""
+Write-behind autosave queue for the Classical Guitar Learning Tracker
+Coalesces repeated saves and writes them from a background thread
+"""
+
+import atexit
+import threading
+import time
+
+from db import current_database, use_database
+
+# Seconds a queued save waits for further edits before it is written
+AUTOSAVE_WINDOW_SECONDS = 1.0
+
+# Longest wait between retries of a save that failed (the wait doubles from the window up to this)
+AUTOSAVE_RETRY_MAX_SECONDS = 60.0
+
+# Seconds after its last write before an idle session's status is forgotten
+SESSION_IDLE_SECONDS = 3600
+
+
+class WriteBehindQueue:
+    """Queue of pending saves, coalesced by key and written in the background.
+
+    A save is queued under a key such as ("goal", goal_id); queuing again
+    under the same key before it is written replaces the arguments, so a
+    burst of edits turns into one write. Each key is written once its
+    window has passed, or earlier by flush(). Saves run against the
+    database that was current when they were queued. A save that fails
+    stays queued and is retried, less and less often, until it succeeds
+    or a newer save for its key replaces it.
+    """
+
+    def __init__(self, window=AUTOSAVE_WINDOW_SECONDS):
+        self.window = window
+        # (database, key) -> [func, args, due time, session id, failed attempts]
+        self._pending = {}
+        # session id -> {'flushed': count, 'error': error of the last write, 'written': monotonic time}
+        self._sessions = {}
+        self._cond = threading.Condition()
+        # Held while writing so two flushes never write the same key out of order
+        self._write_lock = threading.Lock()
+        self._thread = threading.Thread(target=self._run, name="autosave-writer", daemon=True)
+        self._thread.start()
+
+    def submit(self, session_id, key, func, *args):
+        """Queue func(*args) to run under key, replacing any pending save for it"""
+        key = (current_database(), key)
+        with self._cond:
+            due = time.monotonic() + self.window
+            item = self._pending.get(key)
+            if item is None:
+                self._pending[key] = [func, args, due, session_id, 0]
+            else:
+                # New arguments get a fresh try, even if the old ones were waiting to be retried
+                item[0], item[1], item[2], item[3], item[4] = func, args, min(item[2], due), session_id, 0
+            self._session_stats(session_id)
+            self._cond.notify()
+
+    def pending_args(self, key):
+        """Arguments of the save still waiting under key, or None"""
+        with self._cond:
+            item = self._pending.get((current_database(), key))
+            return item[1] if item else None
+
+    def status(self, session_id):
+        """(pending, flushed, last error) for one session"""
+        with self._cond:
+            pending = sum(1 for item in self._pending.values() if item[3] == session_id)
+            stats = self._sessions.get(session_id, {'flushed': 0, 'error': None})
+            return pending, stats['flushed'], stats['error']
+
+    def flush(self, session_id=None):
+        """Write pending saves now - all of them, or just one session's"""
+        with self._write_lock:
+            with self._cond:
+                keys = [key for key, item in self._pending.items()
+                        if session_id is None or item[3] == session_id]
+                items = [(key, self._pending.pop(key)) for key in keys]
+            self._write(items)
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._pending:
+                    self._cond.wait()
+                wait = min(item[2] for item in self._pending.values()) - time.monotonic()
+                if wait > 0:
+                    self._cond.wait(wait)
+                    continue
+            with self._write_lock:
+                with self._cond:
+                    now = time.monotonic()
+                    keys = [key for key, item in self._pending.items() if item[2] <= now]
+                    items = [(key, self._pending.pop(key)) for key in keys]
+                self._write(items)
+
+    def _write(self, items):
+        # flush() may run on a session thread - leave its current database as it was
+        previous_database = current_database()
+        try:
+            for key, item in items:
+                func, args, _due, session_id, failures = item
+                try:
+                    use_database(key[0])
+                    func(*args)
+                    error = None
+                except Exception as e:
+                    print(f"Error in autosave ({func.__name__}): {e}")
+                    error = f"{func.__name__}: {e}"
+                with self._cond:
+                    stats = self._session_stats(session_id)
+                    stats['error'], stats['written'] = error, time.monotonic()
+                    if not error:
+                        stats['flushed'] += 1
+                    elif key not in self._pending:
+                        # Queue it again unless a newer save for the key came in meanwhile
+                        item[2] = time.monotonic() + min(self.window * 2 ** failures, AUTOSAVE_RETRY_MAX_SECONDS)
+                        item[4] = failures + 1
+                        self._pending[key] = item
+                        self._cond.notify()
+        finally:
+            use_database(previous_database)
+        with self._cond:
+            self._forget_idle_sessions()
+
+    def _session_stats(self, session_id):
+        return self._sessions.setdefault(session_id, {'flushed': 0, 'error': None, 'written': time.monotonic()})
+
+    def _forget_idle_sessions(self):
+        """Drop the status of sessions with nothing pending that have not written for a while"""
+        busy = {item[3] for item in self._pending.values()}
+        cutoff = time.monotonic() - SESSION_IDLE_SECONDS
+        for session_id in [session_id for session_id, stats in self._sessions.items()
+                           if session_id not in busy and stats['written'] < cutoff]:
+            del self._sessions[session_id]
+
+
+_queue = None
+_queue_lock = threading.Lock()
+
+
+def get_queue():
+    """Get the process-wide autosave queue, starting its writer on first use"""
+    global _queue
+    if _queue is None:
+        with _queue_lock:
+            if _queue is None:
+                _queue = WriteBehindQueue()
+                # Nothing queued is lost when the server shuts down
+                atexit.register(_queue.flush)
+    return _queue
@@ -0,0 +1,309 @@
+#!/usr/bin/env python3
+"""
+Data-layer benchmarks for the Classical Guitar Learning Tracker
+Seeds synthetic databases and times every app.py data function against them
+"""
+
+import argparse
+import contextlib
+import datetime
+import json
+import os
+import platform
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import storage
+from db import use_database
+
+# Goals per synthetic database, smallest to largest
+DEFAULT_SCALES = [10, 1_000, 10_000, 100_000]
+
+# Journal sizes (characters of earlier entries) of the goals whose journals are read and saved
+DEFAULT_JOURNAL_SIZES = [0, 10_000, 1_000_000, 4_000_000]
+
+# Size range (characters) of one synthetic day's journal entry
+JOURNAL_ENTRY_CHARS = (200, 2000)
+
+# Timed calls per operation (per journal size for journal operations)
+DEFAULT_ITERATIONS = 100
+
+# Vocabulary of the synthetic goal names, tasks and journals
+WORDS = (
+    "scales arpeggios tremolo rest free stroke slur barre legato staccato "
+    "Bach Sor Tárrega Giuliani Carcassi Villa-Lobos Barrios Lágrima Adelita "
+    "étude prelude minuet waltz sight-reading metronome tempo dynamics tone "
+    "thumb index middle ring pinky posture nails fingering shifting vibrato "
+    "practice today slow clean repeat memorized phrase section measures bars"
+).split()
+
+
+def synthetic_text(rng, length):
+    """Pseudo-random practice prose of exactly length characters"""
+    if length <= 0:
+        return ""
+    # Generate at most 64 KB of fresh words and repeat it for longer texts
+    words, size = [], 0
+    while size < min(length, 65536):
+        word = rng.choice(WORDS)
+        words.append(word)
+        size += len(word) + 1
+    chunk = " ".join(words) + "\n"
+    return (chunk * (length // len(chunk) + 1))[:length]
+
+
+def synthetic_journal(rng, size, today):
+    """Daily journal entries of size characters in all, the newest dated the day before today"""
+    entries, day = [], today
+    while size > 0:
+        day -= datetime.timedelta(days=1)
+        length = min(size, rng.randint(*JOURNAL_ENTRY_CHARS))
+        entries.append({'date': day.isoformat(), 'text': synthetic_text(rng, length)})
+        size -= length
+    return entries[::-1]
+
+
+def synthetic_records(count, seed=0, journal_sizes=(), journal_chars=2000):
+    """Yield count export records (see export_import) of synthetic goals.
+
+    The first goals get earlier journal entries of exactly the given
+    journal_sizes in all; the rest get up to journal_chars characters.
+    Nobody has written today's entry yet. Goals spread over the months
+    of the last ten years, with up to five tasks each.
+    """
+    rng = random.Random(seed)
+    today = datetime.date.today()
+    for i in range(count):
+        months_ago = rng.randrange(120)
+        year, month = divmod(today.year * 12 + today.month - 1 - months_ago, 12)
+        created_at = f"{year:04d}-{month + 1:02d}-{rng.randint(1, 28):02d} 12:00:00"
+        journal_size = journal_sizes[i] if i < len(journal_sizes) else rng.randrange(journal_chars + 1)
+        yield {
+            'external_id': f"bench-{seed}-{i}",
+            'month': month + 1,
+            'year': year,
+            'name': " ".join(rng.choice(WORDS) for _ in range(rng.randint(2, 6))).capitalize(),
+            'description': synthetic_text(rng, rng.randrange(400)),
+            'completion_criteria': synthetic_text(rng, rng.randrange(200)),
+            'header_text': "",
+            'created_at': created_at,
+            'updated_at': created_at,
+            'tasks': [{'order': order, 'description': synthetic_text(rng, rng.randint(10, 60))}
+                      for order in range(rng.randint(0, 5))],
+            'journal_entries': synthetic_journal(rng, journal_size, today),
+        }
+
+
+def seed_database(db_path, goals, seed=0, journal_sizes=()):
+    """Fill the database at db_path (with the configured engine) with synthetic goals.
+
+    Returns the ids of the goals holding the journal_sizes journals, in
+    the same order.
+    """
+    use_database(db_path)
+    store = storage.get_storage()
+    store.import_records(synthetic_records(goals, seed, journal_sizes))
+
+    # Imported goals are numbered in file order in a fresh database
+    journal_goal_ids = list(range(1, len(journal_sizes) + 1))
+    for i, goal_id in enumerate(journal_goal_ids):
+        bundle = store.load_goal_bundle(goal_id)
+        if bundle is None or bundle.goal[9] != f"bench-{seed}-{i}":
+            raise RuntimeError(f"{db_path} is not a fresh database - seed into an empty file")
+    return journal_goal_ids
+
+
+def percentile(sorted_samples, fraction):
+    """Nearest-rank percentile of already sorted samples"""
+    index = max(0, min(len(sorted_samples) - 1, int(round(fraction * len(sorted_samples) + 0.5)) - 1))
+    return sorted_samples[index]
+
+
+def summarize(samples_ns):
+    """Latency percentiles (ms) and throughput of a list of timings in nanoseconds"""
+    samples = sorted(samples_ns)
+    total = sum(samples)
+    return {
+        'count': len(samples),
+        'p50_ms': percentile(samples, 0.50) / 1e6,
+        'p95_ms': percentile(samples, 0.95) / 1e6,
+        'p99_ms': percentile(samples, 0.99) / 1e6,
+        'mean_ms': total / len(samples) / 1e6,
+        'max_ms': samples[-1] / 1e6,
+        'ops_per_sec': len(samples) / (total / 1e9) if total else None,
+    }
+
+
+def timed(samples, func, *args):
+    start = time.perf_counter_ns()
+    result = func(*args)
+    samples.append(time.perf_counter_ns() - start)
+    return result
+
+
+def benchmark_scale(app, db_path, goals, journal_sizes, iterations, seed, use_cache):
+    """Seed one database and time every data function against it; returns result rows"""
+    started = time.perf_counter()
+    journal_goal_ids = seed_database(db_path, goals, seed, journal_sizes)
+    seed_seconds = time.perf_counter() - started
+    print(f"⏳ Seeded {goals} goals in {seed_seconds:.1f}s", file=sys.stderr)
+
+    rng = random.Random(seed + 1)
+    read_cache = app.get_read_cache()
+
+    def read(samples, func, *args):
+        if not use_cache:
+            read_cache.clear()
+        return timed(samples, func, *args)
+
+    def goal_ids():
+        return [rng.randint(1, goals) for _ in range(iterations)]
+
+    rows = []
+
+    def record(operation, samples, journal_bytes=None):
+        rows.append({'scale': goals, 'journal_bytes': journal_bytes, 'operation': operation, **summarize(samples)})
+
+    # get_all_goals reads every goal; at large scales a few calls say enough
+    samples = []
+    for _ in range(iterations if goals <= 10000 else max(5, iterations // 20)):
+        read(samples, app.get_all_goals)
+    record('get_all_goals', samples)
+
+    for operation in ('get_goal_by_id', 'get_tasks'):
+        samples = []
+        for goal_id in goal_ids():
+            read(samples, getattr(app, operation), goal_id)
+        record(operation, samples)
+
+    samples = []
+    for goal_id in goal_ids():
+        name = " ".join(rng.choice(WORDS) for _ in range(3))
+        timed(samples, app.save_goal, goal_id, name, synthetic_text(rng, 300), synthetic_text(rng, 100))
+    record('save_goal', samples)
+
+    samples = []
+    for goal_id in goal_ids():
+        tasks = [synthetic_text(rng, rng.randint(10, 60)) for _ in range(rng.randint(1, 5))]
+        timed(samples, app.save_tasks, goal_id, tasks)
+    record('save_tasks', samples)
+
+    # Only today's entry and one window of earlier ones are read, whatever the journal's size
+    for goal_id, size in zip(journal_goal_ids, journal_sizes):
+        samples = []
+        for _ in range(iterations):
+            read(samples, app.get_journal_entries, goal_id, storage.journal_date())
+        record('get_journal_entries', samples, size)
+
+        samples = []
+        for _ in range(iterations):
+            journal = read(samples, app.get_journal_content, goal_id)
+        record('get_journal_content', samples, size)
+
+        # Each save appends a short practice note, as a student would
+        samples = []
+        for _ in range(iterations):
+            journal += f"\n{synthetic_text(rng, 80)}"
+            timed(samples, app.save_journal_content, goal_id, journal, storage.journal_date())
+        record('save_journal_content', samples, size)
+
+    # New goals are completed again so every scale keeps its size
+    created, samples = [], []
+    for _ in range(iterations):
+        created.append(timed(samples, app.create_new_goal)[0])
+    record('create_new_goal', samples)
+
+    samples = []
+    for goal_id in created:
+        timed(samples, app.delete_goal, goal_id)
+    record('delete_goal', samples)
+
+    dataset = {'scale': goals, 'seed_seconds': seed_seconds}
+    if storage.STORAGE_ENGINE == "sqlite":
+        dataset['database_bytes'] = sum(
+            os.path.getsize(path) for path in Path(db_path).parent.glob(Path(db_path).name + "*"))
+    return dataset, rows
+
+
+def run(args):
+    """Run the benchmark matrix and return the JSON report"""
+    # Imported here so that 'seed' works without Streamlit's import cost
+    import app
+
+    report = {
+        'meta': {
+            'started_at': datetime.datetime.now().isoformat(timespec='seconds'),
+            'engine': storage.STORAGE_ENGINE,
+            'read_cache': args.cache,
+            'iterations': args.iterations,
+            'seed': args.seed,
+            'python': platform.python_version(),
+            'sqlite': sqlite3.sqlite_version,
+            'platform': platform.platform(),
+        },
+        'datasets': [],
+        'results': [],
+    }
+    with tempfile.TemporaryDirectory(prefix="guitar_tracker_bench_") as workdir:
+        for goals in args.scales:
+            db_path = Path(workdir) / f"bench_{goals}.db"
+            dataset, rows = benchmark_scale(app, db_path, goals, args.journal_sizes,
+                                            args.iterations, args.seed, args.cache == "on")
+            report['datasets'].append(dataset)
+            report['results'].extend(rows)
+    return report
+
+
+def main():
+    """Command line entry point"""
+    parser = argparse.ArgumentParser(description="Benchmark the guitar tracker data layer")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = subparsers.add_parser("run", help="time every data function on synthetic databases")
+    run_parser.add_argument("--scales", type=int, nargs="+", default=DEFAULT_SCALES,
+                            help="goals per database (default: %(default)s)")
+    run_parser.add_argument("--journal-sizes", type=int, nargs="+", default=DEFAULT_JOURNAL_SIZES,
+                            help="characters of earlier journal entries of the goals whose journals are read and saved "
+                                 "(default: %(default)s)")
+    run_parser.add_argument("--iterations", type=int, default=DEFAULT_ITERATIONS,
+                            help="timed calls per operation (default: %(default)s)")
+    run_parser.add_argument("--cache", choices=("off", "on"), default="off",
+                            help="serve reads through the read cache (default: off, every read goes to storage)")
+    run_parser.add_argument("--seed", type=int, default=0, help="random seed for the synthetic data")
+    run_parser.add_argument("--output", help="write the JSON report here instead of stdout")
+
+    seed_parser = subparsers.add_parser("seed", help="fill a new database with synthetic goals")
+    seed_parser.add_argument("path", help="database file to create")
+    seed_parser.add_argument("--goals", type=int, default=1000, help="number of goals (default: %(default)s)")
+    seed_parser.add_argument("--journal-sizes", type=int, nargs="*", default=[],
+                             help="exact sizes of the earlier journal entries of the first goals")
+    seed_parser.add_argument("--seed", type=int, default=0, help="random seed for the synthetic data")
+    args = parser.parse_args()
+
+    if args.command == "seed":
+        if Path(args.path).exists():
+            print(f"❌ {args.path} already exists", file=sys.stderr)
+            return 1
+        seed_database(Path(args.path).resolve(), args.goals, args.seed, args.journal_sizes)
+        print(f"✅ Seeded {args.goals} goals into {args.path}", file=sys.stderr)
+        return 0
+
+    # The data functions print progress; keep stdout for the report
+    with contextlib.redirect_stdout(sys.stderr):
+        report = run(args)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as out:
+            json.dump(report, out, indent=2)
+        print(f"✅ Wrote {len(report['results'])} results to {args.output}", file=sys.stderr)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
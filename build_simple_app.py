@@ -32,6 +32,17 @@ a = Analysis(
     binaries=[],
     datas=[
         ('app.py', '.'),
+        ('autosave.py', '.'),
+        ('db.py', '.'),
+        ('diagnostics.py', '.'),
+        ('export_import.py', '.'),
+        ('migrations.py', '.'),
+        ('slow_queries.py', '.'),
+        ('storage.py', '.'),
+        ('tenancy.py', '.'),
+        ('text_codec.py', '.'),
+        ('static/guitar_tracker.css', 'static'),
+        ('.streamlit/config.toml', '.streamlit'),
         ('guitar_icon.png', '.'),
         ('requirements.txt', '.'),
         ('README.md', '.'),
@@ -0,0 +1,200 @@
+"""
+Shared SQLite connection layer for the Classical Guitar Learning Tracker
+Keeps a bounded pool of configured connections per database, one per thread
+"""
+
+import atexit
+import contextvars
+import os
+import sqlite3
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from pathlib import Path
+
+import diagnostics
+import slow_queries
+import text_codec
+
+# Database setup - Use user's home directory for database (GUITAR_TRACKER_DB overrides it)
+DB_PATH = Path(os.environ.get("GUITAR_TRACKER_DB") or Path.home() / "guitar_tracker.db")
+
+# Upper bound on pooled connections (roughly one per concurrent session thread)
+MAX_CONNECTIONS = 32
+
+# How long a writer waits on a locked database before giving up
+BUSY_TIMEOUT_MS = 5000
+
+# Upper bound on databases with open pools (one per active student shard)
+MAX_OPEN_DATABASES = 16
+
+# Database the current thread works on - see use_database()
+_current_database = contextvars.ContextVar('current_database', default=DB_PATH)
+
+
+class ConnectionPool:
+    """Bounded pool of SQLite connections keyed by thread"""
+
+    def __init__(self, db_path, max_connections=MAX_CONNECTIONS):
+        self.db_path = db_path
+        self.max_connections = max_connections
+        self._lock = threading.Lock()
+        # thread ident -> [connection, nesting depth], least recently used first
+        self._connections = OrderedDict()
+        self._retired = False
+
+    def _connect(self):
+        """Open a connection and apply the per-connection settings once"""
+        # isolation_level=None: transactions are managed explicitly in transaction()
+        conn = sqlite3.connect(self.db_path, isolation_level=None, check_same_thread=False)
+        conn.execute(f"PRAGMA busy_timeout = {BUSY_TIMEOUT_MS}")
+        conn.execute("PRAGMA journal_mode = WAL")
+        conn.execute("PRAGMA synchronous = NORMAL")
+        # Deleting a goal cascades to its tasks and journal
+        conn.execute("PRAGMA foreign_keys = ON")
+        # Long journals and descriptions are stored compressed; SQL reads them through decode_text()
+        text_codec.register(conn)
+        return conn
+
+    def _evict(self):
+        """Drop idle connections until there is room for one more"""
+        live_threads = {thread.ident for thread in threading.enumerate()}
+        # Connections owned by finished threads go first
+        for ident in list(self._connections):
+            if ident not in live_threads and self._connections[ident][1] == 0:
+                self._connections.pop(ident)[0].close()
+        # Then the least recently used idle ones
+        for ident in list(self._connections):
+            if len(self._connections) < self.max_connections:
+                break
+            if self._connections[ident][1] == 0:
+                self._connections.pop(ident)[0].close()
+
+    def _acquire(self):
+        """Get this thread's connection entry, opening one if needed"""
+        ident = threading.get_ident()
+        with self._lock:
+            entry = self._connections.get(ident)
+            if entry is not None:
+                self._connections.move_to_end(ident)
+                entry[1] += 1
+                return entry, True
+            if len(self._connections) >= self.max_connections:
+                self._evict()
+            pooled = len(self._connections) < self.max_connections
+
+        entry = [self._connect(), 1]
+        if pooled:
+            with self._lock:
+                self._connections[ident] = entry
+        return entry, pooled
+
+    def _release(self, entry, pooled):
+        if pooled:
+            with self._lock:
+                entry[1] -= 1
+                if self._retired and entry[1] == 0:
+                    # Pool was evicted while this connection was busy
+                    self._connections.pop(threading.get_ident(), None)
+                    entry[0].close()
+        else:
+            # Pool was full of busy connections - this one was a one-off
+            entry[0].close()
+
+    @contextmanager
+    def transaction(self, write=False):
+        """Run a block inside a transaction and yield a cursor.
+
+        Commits on success and rolls back on error. Nested calls on the same
+        thread join the outer transaction. Pass write=True to take the write
+        lock up front so the transaction cannot fail on a lock upgrade.
+        """
+        entry, pooled = self._acquire()
+        conn = entry[0]
+        outermost = not conn.in_transaction
+        try:
+            if outermost:
+                conn.execute("BEGIN IMMEDIATE" if write else "BEGIN")
+            cursor = conn.cursor()
+            if slow_queries.ENABLED:
+                cursor = slow_queries.SlowQueryCursor(cursor)
+            if diagnostics.ENABLED:
+                cursor = diagnostics.CountingCursor(cursor)
+            try:
+                yield cursor
+            except BaseException:
+                if outermost and conn.in_transaction:
+                    conn.execute("ROLLBACK")
+                raise
+            else:
+                if outermost and conn.in_transaction:
+                    conn.execute("COMMIT")
+            finally:
+                cursor.close()
+        finally:
+            self._release(entry, pooled)
+
+    def retire(self):
+        """Close idle connections now and busy ones as soon as they are released"""
+        with self._lock:
+            self._retired = True
+            for ident in list(self._connections):
+                if self._connections[ident][1] == 0:
+                    self._connections.pop(ident)[0].close()
+
+    def close_all(self):
+        """Close every pooled connection"""
+        with self._lock:
+            while self._connections:
+                _, (conn, _depth) = self._connections.popitem()
+                conn.close()
+
+
+# database path -> ConnectionPool, least recently used first
+_pools = OrderedDict()
+_pool_lock = threading.Lock()
+
+
+def use_database(db_path):
+    """Point this thread's data access at db_path (DB_PATH unless changed)"""
+    _current_database.set(Path(db_path))
+
+
+def current_database():
+    """Database this thread's data access goes to"""
+    return _current_database.get()
+
+
+def get_pool(db_path=None):
+    """Get the connection pool for a database (default: the current one).
+
+    Pools are created on first use; only MAX_OPEN_DATABASES stay open and
+    the least recently used one is retired when another is needed.
+    """
+    db_path = Path(db_path) if db_path else current_database()
+    with _pool_lock:
+        pool = _pools.get(db_path)
+        if pool is not None:
+            _pools.move_to_end(db_path)
+            return pool
+        pool = _pools[db_path] = ConnectionPool(db_path)
+        while len(_pools) > MAX_OPEN_DATABASES:
+            _, stale = _pools.popitem(last=False)
+            stale.retire()
+    return pool
+
+
+def close_all_pools():
+    """Close every connection to every database"""
+    with _pool_lock:
+        while _pools:
+            _, pool = _pools.popitem()
+            pool.close_all()
+
+
+atexit.register(close_all_pools)
+
+
+def transaction(write=False):
+    """Transaction context manager on the current database's pool"""
+    return get_pool().transaction(write=write)
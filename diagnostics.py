@@ -0,0 +1,284 @@
+"""
+Rerun diagnostics for the Classical Guitar Learning Tracker
+Times each rerun and the page and data functions inside it, with query and row counts
+"""
+
+import atexit
+import contextvars
+import functools
+import os
+import re
+import threading
+import time
+from collections import namedtuple
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+# Off unless GUITAR_TRACKER_DIAGNOSTICS is set; when off, instrument() returns
+# functions unchanged and the database layer hands out plain cursors
+ENABLED = os.environ.get("GUITAR_TRACKER_DIAGNOSTICS", "").lower() in ("1", "true", "on", "yes")
+
+# Prometheus text file rewritten as reruns finish (for a node_exporter textfile collector)
+METRICS_FILE = Path(os.environ.get("GUITAR_TRACKER_METRICS_FILE") or Path.home() / "guitar_tracker_metrics.prom")
+
+# Seconds between rewrites of METRICS_FILE
+METRICS_WRITE_INTERVAL = 5.0
+
+# Serve the same text on http://127.0.0.1:<port>/metrics when set
+METRICS_PORT = int(os.environ.get("GUITAR_TRACKER_METRICS_PORT") or 0)
+
+# Upper bounds (seconds) of the latency histogram buckets
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+# One timed call inside a rerun; depth is its nesting level (main is 0)
+Span = namedtuple('Span', ['name', 'depth', 'ms', 'queries', 'rows'])
+
+
+class RerunTrace:
+    """Timings and query counts collected while one rerun executes"""
+
+    def __init__(self, cause):
+        self.cause = cause
+        self.started = time.perf_counter()
+        self.spans = []
+        self.queries = 0
+        self.rows = 0
+        self.depth = 0
+        self.outcome = None
+        self.ms = None
+
+    def finish(self, outcome):
+        self.outcome = outcome
+        self.ms = (time.perf_counter() - self.started) * 1000
+
+
+# Trace of the rerun (or background call) running in this context
+_current_trace = contextvars.ContextVar('current_trace', default=None)
+
+
+class Metrics:
+    """Process-wide totals, exported in the Prometheus text format"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # function -> [call count, total seconds, queries, rows, bucket counts]
+        self.calls = {}
+        # cause -> count
+        self.reruns = {}
+        # outcome -> [count, total seconds, bucket counts]
+        self.rerun_seconds = {}
+        self._last_write = 0.0
+
+    @staticmethod
+    def _buckets(seconds):
+        return [1 if seconds <= bound else 0 for bound in LATENCY_BUCKETS]
+
+    def observe_call(self, name, seconds, queries, rows):
+        with self._lock:
+            entry = self.calls.get(name)
+            if entry is None:
+                entry = self.calls[name] = [0, 0.0, 0, 0, [0] * len(LATENCY_BUCKETS)]
+            entry[0] += 1
+            entry[1] += seconds
+            entry[2] += queries
+            entry[3] += rows
+            entry[4] = [count + hit for count, hit in zip(entry[4], self._buckets(seconds))]
+
+    def observe_rerun(self, trace):
+        seconds = trace.ms / 1000
+        # Widget keys carry goal ids; fold them so the label set stays small
+        cause = re.sub(r'\d+', 'N', trace.cause or "unknown")
+        with self._lock:
+            self.reruns[cause] = self.reruns.get(cause, 0) + 1
+            entry = self.rerun_seconds.get(trace.outcome)
+            if entry is None:
+                entry = self.rerun_seconds[trace.outcome] = [0, 0.0, [0] * len(LATENCY_BUCKETS)]
+            entry[0] += 1
+            entry[1] += seconds
+            entry[2] = [count + hit for count, hit in zip(entry[2], self._buckets(seconds))]
+
+    def render(self):
+        """All metrics as Prometheus text exposition format"""
+        def histogram(name, labels, count, total, buckets):
+            lines = [f'{name}_bucket{{{labels},le="{bound}"}} {hits}' for bound, hits in zip(LATENCY_BUCKETS, buckets)]
+            lines.append(f'{name}_bucket{{{labels},le="+Inf"}} {count}')
+            lines.append(f'{name}_sum{{{labels}}} {total:.6f}')
+            lines.append(f'{name}_count{{{labels}}} {count}')
+            return lines
+
+        with self._lock:
+            lines = [
+                '# HELP guitar_tracker_reruns_total Script reruns by cause.',
+                '# TYPE guitar_tracker_reruns_total counter',
+            ]
+            lines += [f'guitar_tracker_reruns_total{{cause="{_escape(cause)}"}} {count}'
+                      for cause, count in sorted(self.reruns.items())]
+            lines += [
+                '# HELP guitar_tracker_rerun_seconds Wall time of whole reruns by how they ended.',
+                '# TYPE guitar_tracker_rerun_seconds histogram',
+            ]
+            for outcome, (count, total, buckets) in sorted(self.rerun_seconds.items()):
+                lines += histogram('guitar_tracker_rerun_seconds', f'outcome="{_escape(outcome)}"', count, total, buckets)
+            lines += [
+                '# HELP guitar_tracker_call_seconds Wall time of instrumented page and data functions.',
+                '# TYPE guitar_tracker_call_seconds histogram',
+            ]
+            for name, (count, total, _, _, buckets) in sorted(self.calls.items()):
+                lines += histogram('guitar_tracker_call_seconds', f'function="{name}"', count, total, buckets)
+            lines += [
+                '# HELP guitar_tracker_queries_total SQL statements executed inside each function.',
+                '# TYPE guitar_tracker_queries_total counter',
+            ]
+            lines += [f'guitar_tracker_queries_total{{function="{name}"}} {entry[2]}'
+                      for name, entry in sorted(self.calls.items())]
+            lines += [
+                '# HELP guitar_tracker_rows_fetched_total Rows fetched inside each function.',
+                '# TYPE guitar_tracker_rows_fetched_total counter',
+            ]
+            lines += [f'guitar_tracker_rows_fetched_total{{function="{name}"}} {entry[3]}'
+                      for name, entry in sorted(self.calls.items())]
+        return '\n'.join(lines) + '\n'
+
+    def write(self, force=False):
+        """Rewrite METRICS_FILE, at most every METRICS_WRITE_INTERVAL seconds unless forced"""
+        now = time.monotonic()
+        if not force and now - self._last_write < METRICS_WRITE_INTERVAL:
+            return
+        self._last_write = now
+        try:
+            # Write then rename so a scraper never reads half a file
+            temporary = METRICS_FILE.with_name(METRICS_FILE.name + ".tmp")
+            temporary.write_text(self.render(), encoding="utf-8")
+            os.replace(temporary, METRICS_FILE)
+        except OSError as e:
+            print(f"Error writing metrics to {METRICS_FILE}: {e}")
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+METRICS = Metrics()
+
+
+def instrument(func):
+    """Time calls to func and count the queries and rows they cause.
+
+    Calls inside a rerun are added to its trace as spans; all calls are
+    added to the process-wide metrics. Returns func itself when
+    diagnostics are off.
+    """
+    if not ENABLED:
+        return func
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        trace = _current_trace.get()
+        token = None
+        if trace is None:
+            # Called outside a rerun (e.g. by the autosave writer): count it on its own
+            trace = RerunTrace(cause=None)
+            token = _current_trace.set(trace)
+        span_index = len(trace.spans)
+        trace.spans.append(None)
+        queries, rows, depth = trace.queries, trace.rows, trace.depth
+        trace.depth += 1
+        start = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            seconds = time.perf_counter() - start
+            trace.depth = depth
+            span = Span(func.__name__, depth, seconds * 1000, trace.queries - queries, trace.rows - rows)
+            trace.spans[span_index] = span
+            METRICS.observe_call(span.name, seconds, span.queries, span.rows)
+            if token is not None:
+                _current_trace.reset(token)
+
+    return wrapper
+
+
+def start_rerun(cause):
+    """Begin the trace of a rerun in the current context"""
+    trace = RerunTrace(cause)
+    return trace, _current_trace.set(trace)
+
+
+def finish_rerun(trace, token, outcome):
+    """End a rerun's trace, add it to the metrics and export them"""
+    _current_trace.reset(token)
+    trace.finish(outcome)
+    METRICS.observe_rerun(trace)
+    METRICS.write()
+
+
+class CountingCursor:
+    """sqlite3 cursor wrapper counting statements executed and rows fetched"""
+
+    __slots__ = ('_cursor',)
+
+    def __init__(self, cursor):
+        self._cursor = cursor
+
+    def execute(self, sql, parameters=()):
+        self._cursor.execute(sql, parameters)
+        _count(queries=1)
+        return self
+
+    def executemany(self, sql, seq_of_parameters):
+        self._cursor.executemany(sql, seq_of_parameters)
+        _count(queries=1)
+        return self
+
+    def fetchone(self):
+        row = self._cursor.fetchone()
+        if row is not None:
+            _count(rows=1)
+        return row
+
+    def fetchall(self):
+        rows = self._cursor.fetchall()
+        _count(rows=len(rows))
+        return rows
+
+    def __iter__(self):
+        for row in self._cursor:
+            _count(rows=1)
+            yield row
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+
+def _count(queries=0, rows=0):
+    trace = _current_trace.get()
+    if trace is not None:
+        trace.queries += queries
+        trace.rows += rows
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path != "/metrics":
+            self.send_error(404)
+            return
+        body = METRICS.render().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        # Scrapes every few seconds would drown the app's own output
+        pass
+
+
+if ENABLED:
+    atexit.register(METRICS.write, force=True)
+    if METRICS_PORT:
+        try:
+            _server = ThreadingHTTPServer(("127.0.0.1", METRICS_PORT), _MetricsHandler)
+            threading.Thread(target=_server.serve_forever, name="metrics-server", daemon=True).start()
+        except OSError as e:
+            print(f"Metrics endpoint disabled: cannot listen on port {METRICS_PORT}: {e}")
@@ -0,0 +1,394 @@
+#!/usr/bin/env python3
+"""
+Streaming export and import for the Classical Guitar Learning Tracker
+Goals travel with their tasks, journal entries and practice sessions as one record, in JSONL or CSV
+"""
+
+import argparse
+import csv
+import datetime
+import itertools
+import json
+import sys
+import uuid
+
+from db import transaction
+from migrations import ensure_schema, index_compressed_rows
+from text_codec import decode_text, encode_text
+
+# Goals read or written per transaction
+BATCH_SIZE = 500
+
+GOAL_FIELDS = ['external_id', 'month', 'year', 'name', 'description',
+               'completion_criteria', 'header_text', 'created_at', 'updated_at']
+
+# CSV layout: one 'goal' row, then its 'task' rows, one 'journal' row per entry
+# and one 'session' row per practice session (its notes in text)
+CSV_FIELDS = ['record'] + GOAL_FIELDS + ['task_order', 'entry_date', 'started_at', 'minutes', 'tempo', 'text']
+
+# Journals can be far larger than the csv module's default 128 KB field limit
+csv.field_size_limit(2 ** 31 - 1)
+
+
+def record_journal_entries(record):
+    """Journal entries of a record as [{'date', 'text'}], oldest first.
+
+    Records from before journals were split into dated entries carry one
+    'journal' text instead; it becomes a single entry dated with the
+    goal's creation day. Entries without a date get the same day.
+    """
+    fallback = (record.get('created_at') or datetime.date.today().isoformat())[:10]
+    entries = record.get('journal_entries')
+    if entries is None:
+        entries = [{'date': fallback, 'text': record.get('journal') or ""}]
+    entries = [{'date': entry.get('date') or fallback, 'text': entry.get('text') or ""} for entry in entries]
+    return sorted((entry for entry in entries if entry['text']), key=lambda entry: entry['date'])
+
+
+def record_practice_sessions(record):
+    """Practice sessions of a record as [{'started_at', 'minutes', 'task_order', 'tempo', 'notes'}], or None.
+
+    None means the record is from before sessions were exported, so an
+    import leaves the goal's logged sessions as they are. task_order is
+    the slot of the task practiced, since task ids do not survive an import.
+    """
+    sessions = record.get('practice_sessions')
+    if sessions is None:
+        return None
+    return [{'started_at': session['started_at'], 'minutes': int(session['minutes']),
+             'task_order': session.get('task_order'), 'tempo': session.get('tempo'),
+             'notes': session.get('notes') or ""} for session in sessions]
+
+
+def checked_record(record):
+    """A record ready to import, with missing goal fields filled in; raises ValueError if it cannot be.
+
+    Hand-made files may leave out anything but the goal itself: created_at
+    defaults to now (UTC, like the database), month and year to those of
+    created_at, updated_at to created_at and the text fields to "".
+    """
+    if not isinstance(record, dict):
+        raise ValueError("not a goal object")
+    record = dict(record)
+    created_at = record.get('created_at')
+    try:
+        created = (datetime.datetime.fromisoformat(str(created_at)) if created_at
+                   else datetime.datetime.now(datetime.timezone.utc))
+    except ValueError:
+        raise ValueError(f"created_at {created_at!r} is not a date and time") from None
+    record['created_at'] = created.strftime('%Y-%m-%d %H:%M:%S')
+    record['updated_at'] = record.get('updated_at') or record['created_at']
+    for field, default, low, high in (('month', created.month, 1, 12), ('year', created.year, 1, 9999)):
+        value = record.get(field)
+        try:
+            record[field] = default if value in (None, "") else int(value)
+        except (TypeError, ValueError):
+            raise ValueError(f"{field} {value!r} is not a number") from None
+        if not low <= record[field] <= high:
+            raise ValueError(f"{field} {value!r} is out of range")
+    for field in ('name', 'description', 'completion_criteria', 'header_text'):
+        if record.get(field) is None:
+            record[field] = ""
+        elif not isinstance(record[field], str):
+            raise ValueError(f"{field} is not text")
+    try:
+        record['tasks'] = [{'order': int(task['order']), 'description': str(task['description'])}
+                           for task in record.get('tasks') or []]
+        record_journal_entries(record)
+        record_practice_sessions(record)
+    except (AttributeError, KeyError, TypeError, ValueError) as e:
+        raise ValueError(f"malformed tasks, journal entries or practice sessions ({e!r})") from None
+    return record
+
+
+def checked_records(records, errors):
+    """Yield the records that checked_record() accepts; the others add a message to errors and are skipped"""
+    for number, record in enumerate(records, 1):
+        try:
+            yield checked_record(record)
+        except ValueError as e:
+            name = record.get('name') if isinstance(record, dict) else None
+            errors.append(f"Goal {number}{f' ({name})' if name else ''} skipped: {e}")
+
+
+def iter_goal_records(batch_size=BATCH_SIZE):
+    """Yield every goal as a dict with its tasks, journal entries and practice sessions, one at a time.
+
+    Reads from a single snapshot; only one batch of goal rows and one
+    goal's journal are held in memory at once.
+    """
+    with transaction() as cursor:
+        last_id = 0
+        while True:
+            cursor.execute(f'''
+                SELECT id, {', '.join(GOAL_FIELDS)} FROM goals
+                WHERE id > ? ORDER BY id LIMIT ?
+            ''', (last_id, batch_size))
+            goals = cursor.fetchall()
+            if not goals:
+                return
+            last_id = goals[-1][0]
+
+            cursor.execute('''
+                SELECT goal_id, task_order, task_description FROM tasks
+                WHERE goal_id BETWEEN ? AND ? ORDER BY goal_id, task_order
+            ''', (goals[0][0], last_id))
+            tasks = {}
+            for goal_id, order, description in cursor.fetchall():
+                tasks.setdefault(goal_id, []).append({'order': order, 'description': description})
+
+            for row in goals:
+                goal_id = row[0]
+                record = dict(zip(GOAL_FIELDS, row[1:]))
+                record['description'] = decode_text(record['description'])
+                record['tasks'] = tasks.get(goal_id, [])
+                cursor.execute('''
+                    SELECT entry_date, content FROM journal_entries
+                    WHERE goal_id = ? AND content != '' ORDER BY entry_date
+                ''', (goal_id,))
+                record['journal_entries'] = [{'date': day, 'text': decode_text(text)}
+                                             for day, text in cursor.fetchall()]
+                cursor.execute('''
+                    SELECT practice_sessions.started_at, duration_minutes, tasks.task_order, tempo, notes
+                    FROM practice_sessions LEFT JOIN tasks ON tasks.id = practice_sessions.task_id
+                    WHERE practice_sessions.goal_id = ? ORDER BY practice_sessions.started_at, practice_sessions.id
+                ''', (goal_id,))
+                record['practice_sessions'] = [
+                    {'started_at': started_at, 'minutes': minutes, 'task_order': order, 'tempo': tempo, 'notes': notes}
+                    for started_at, minutes, order, tempo, notes in cursor.fetchall()]
+                yield record
+
+
+def write_jsonl(records, out):
+    """Write records to a text stream as one JSON object per line"""
+    count = 0
+    for record in records:
+        out.write(json.dumps(record, ensure_ascii=False))
+        out.write('\n')
+        count += 1
+    return count
+
+
+def read_jsonl(stream):
+    """Yield records from a JSONL text stream"""
+    for line in stream:
+        if line.strip():
+            yield json.loads(line)
+
+
+def write_csv(records, out):
+    """Write records to a text stream in the flat CSV layout"""
+    writer = csv.DictWriter(out, fieldnames=CSV_FIELDS)
+    writer.writeheader()
+    count = 0
+    for record in records:
+        writer.writerow({'record': 'goal', **{field: record[field] for field in GOAL_FIELDS}})
+        for task in record['tasks']:
+            writer.writerow({'record': 'task', 'external_id': record['external_id'],
+                             'task_order': task['order'], 'text': task['description']})
+        for entry in record_journal_entries(record):
+            writer.writerow({'record': 'journal', 'external_id': record['external_id'],
+                             'entry_date': entry['date'], 'text': entry['text']})
+        for session in record_practice_sessions(record) or []:
+            writer.writerow({'record': 'session', 'external_id': record['external_id'],
+                             'task_order': session['task_order'], 'started_at': session['started_at'],
+                             'minutes': session['minutes'], 'tempo': session['tempo'], 'text': session['notes']})
+        count += 1
+    return count
+
+
+def read_csv(stream):
+    """Yield records from a CSV text stream, regrouping each goal's rows"""
+    record = None
+    reader = csv.DictReader(stream)
+    for row in reader:
+        kind = row['record']
+        if kind == 'goal':
+            if record is not None:
+                yield record
+            record = {field: row[field] for field in GOAL_FIELDS}
+            for field in ('month', 'year'):
+                record[field] = int(record[field]) if record[field] else None
+            record['tasks'] = []
+            record['journal_entries'] = []
+            # Files from before practice sessions were exported have no minutes column
+            if 'minutes' in reader.fieldnames:
+                record['practice_sessions'] = []
+        elif record is None or row['external_id'] != record['external_id']:
+            raise ValueError(f"CSV {kind} row for {row['external_id']} does not follow its goal row")
+        elif kind == 'task':
+            record['tasks'].append({'order': int(row['task_order']), 'description': row['text']})
+        elif kind == 'journal':
+            # Files from before dated entries have no entry_date column
+            record['journal_entries'].append({'date': row.get('entry_date'), 'text': row['text']})
+        elif kind == 'session':
+            record['practice_sessions'].append({
+                'started_at': row['started_at'], 'minutes': int(row['minutes']),
+                'task_order': int(row['task_order']) if row['task_order'] else None,
+                'tempo': int(row['tempo']) if row['tempo'] else None, 'notes': row['text']})
+    if record is not None:
+        yield record
+
+
+def import_snapshots(cursor, batch, goal_ids):
+    """Snapshot revision rows for the journal entries an import batch is about to replace.
+
+    Deltas replay from an entry's latest snapshot, so every entry with a
+    history whose text the import changes (or removes) gets its imported
+    text as a new snapshot. Entries without a history need none.
+    """
+    rows = []
+    for record in batch:
+        goal_id = goal_ids[record['external_id']]
+        cursor.execute('SELECT DISTINCT entry_date FROM journal_revisions WHERE goal_id = ?', (goal_id,))
+        revised = sorted(row[0] for row in cursor.fetchall())
+        if not revised:
+            continue
+        cursor.execute('SELECT entry_date, content FROM journal_entries WHERE goal_id = ?', (goal_id,))
+        current = {day: decode_text(content) or "" for day, content in cursor.fetchall()}
+        cursor.execute('SELECT MAX(revision) FROM journal_revisions WHERE goal_id = ?', (goal_id,))
+        last_revision = cursor.fetchone()[0]
+        # Later entries of the same day win, as on insert
+        imported = {entry['date']: entry['text'] for entry in record_journal_entries(record)}
+        for day in revised:
+            if imported.get(day, "") != current.get(day, ""):
+                last_revision += 1
+                rows.append((goal_id, day, last_revision, 'snapshot', encode_text(imported.get(day, ""))))
+    return rows
+
+
+def import_records(records, batch_size=BATCH_SIZE, progress=None):
+    """Upsert goal records by external_id, one transaction per batch.
+
+    An imported goal replaces the tasks, journal entries and practice
+    sessions of the goal with the same external id, or is added as a new
+    goal. Records without practice sessions leave the logged ones alone. progress(count) is
+    called after each batch with the number of goals imported so far.
+    Returns the total number of goals imported.
+    """
+    total = 0
+    records = iter(records)
+    while True:
+        batch = list(itertools.islice(records, batch_size))
+        if not batch:
+            return total
+        for record in batch:
+            # Hand-made files may leave the id out; such goals are always added
+            if not record.get('external_id'):
+                record['external_id'] = uuid.uuid4().hex
+
+        with transaction(write=True) as cursor:
+            cursor.executemany(f'''
+                INSERT INTO goals ({', '.join(GOAL_FIELDS)})
+                VALUES ({', '.join('?' for _ in GOAL_FIELDS)})
+                ON CONFLICT (external_id) DO UPDATE SET
+                    {', '.join(f'{field} = excluded.{field}' for field in GOAL_FIELDS[1:])}
+            ''', [tuple(encode_text(record.get(field)) if field == 'description' else record.get(field)
+                        for field in GOAL_FIELDS) for record in batch])
+
+            cursor.execute(f'''
+                SELECT external_id, id FROM goals
+                WHERE external_id IN ({', '.join('?' for _ in batch)})
+            ''', [record['external_id'] for record in batch])
+            goal_ids = dict(cursor.fetchall())
+            affected = [(goal_ids[record['external_id']],) for record in batch]
+            sessions = [(goal_ids[record['external_id']], record_practice_sessions(record)) for record in batch]
+            sessions = [(goal_id, goal_sessions) for goal_id, goal_sessions in sessions if goal_sessions is not None]
+
+            # Sessions go first, so their rollups are taken down before the tasks they point at
+            cursor.executemany('DELETE FROM practice_sessions WHERE goal_id = ?',
+                               [(goal_id,) for goal_id, _ in sessions])
+            cursor.executemany('DELETE FROM tasks WHERE goal_id = ?', affected)
+            cursor.executemany('''
+                INSERT INTO tasks (goal_id, task_description, task_order)
+                VALUES (?, ?, ?)
+            ''', [(goal_ids[record['external_id']], task['description'], task['order'])
+                  for record in batch for task in record.get('tasks', [])])
+
+            cursor.executemany('INSERT INTO journal_revisions (goal_id, entry_date, revision, kind, payload) '
+                               'VALUES (?, ?, ?, ?, ?)', import_snapshots(cursor, batch, goal_ids))
+            cursor.executemany('DELETE FROM journal_entries WHERE goal_id = ?', affected)
+            # Later entries of the same day win, as with repeated saves
+            cursor.executemany('''
+                INSERT INTO journal_entries (goal_id, entry_date, content)
+                VALUES (?, ?, ?)
+                ON CONFLICT (goal_id, entry_date) DO UPDATE SET content = excluded.content
+            ''', [(goal_ids[record['external_id']], entry['date'], encode_text(entry['text']))
+                  for record in batch for entry in record_journal_entries(record)])
+            # The search triggers leave compressed text out of the index
+            index_compressed_rows(cursor, goal_ids.values())
+
+            # Sessions find their task again by its slot; the practice_rollups triggers rebuild the totals
+            cursor.executemany('''
+                INSERT INTO practice_sessions (goal_id, task_id, started_at, duration_minutes, tempo, notes)
+                VALUES (?, (SELECT id FROM tasks WHERE goal_id = ? AND task_order = ?), ?, ?, ?, ?)
+            ''', [(goal_id, goal_id, session['task_order'], session['started_at'], session['minutes'],
+                   session['tempo'], session['notes'])
+                  for goal_id, goal_sessions in sessions for session in goal_sessions])
+
+        total += len(batch)
+        if progress:
+            progress(total)
+
+
+def detect_format(path, fmt=None):
+    """Pick 'jsonl' or 'csv' from an explicit format or the file extension"""
+    if fmt:
+        return fmt
+    return 'csv' if str(path).lower().endswith('.csv') else 'jsonl'
+
+
+def export_to(out, fmt, records=None):
+    """Stream goal records (default: every goal) to a text stream; returns the number exported"""
+    writer = write_csv if fmt == 'csv' else write_jsonl
+    return writer(iter_goal_records() if records is None else records, out)
+
+
+def import_from(stream, fmt, progress=None, importer=import_records, errors=None):
+    """Import goals from a text stream with importer(records, progress=...); returns the number imported.
+
+    Records that cannot be imported are skipped, with a message for each
+    added to errors (when given).
+    """
+    reader = read_csv if fmt == 'csv' else read_jsonl
+    return importer(checked_records(reader(stream), [] if errors is None else errors), progress=progress)
+
+
+def main():
+    """Command line entry point"""
+    parser = argparse.ArgumentParser(description="Export or import guitar tracker goals")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    for command, help_text in (("export", "write all goals to a file"), ("import", "load goals from a file")):
+        sub = subparsers.add_parser(command, help=help_text)
+        sub.add_argument("path", help="JSONL or CSV file ('-' for stdout/stdin)")
+        sub.add_argument("--format", choices=("jsonl", "csv"), help="file format (default: from the extension)")
+    args = parser.parse_args()
+
+    ensure_schema()
+    fmt = detect_format(args.path, args.format)
+
+    if args.command == "export":
+        if args.path == "-":
+            count = export_to(sys.stdout, fmt)
+        else:
+            with open(args.path, "w", encoding="utf-8", newline="") as out:
+                count = export_to(out, fmt)
+        print(f"✅ Exported {count} goals.", file=sys.stderr)
+    else:
+        def report(done):
+            print(f"⏳ Imported {done} goals...", file=sys.stderr)
+
+        errors = []
+        if args.path == "-":
+            count = import_from(sys.stdin, fmt, progress=report, errors=errors)
+        else:
+            with open(args.path, encoding="utf-8", newline="") as stream:
+                count = import_from(stream, fmt, progress=report, errors=errors)
+        for error in errors:
+            print(f"⚠️ {error}", file=sys.stderr)
+        print(f"✅ Imported {count} goals.", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -36,7 +36,7 @@ fi
 # Check if Streamlit is installed
 if ! python3 -c "import streamlit" 2>/dev/null; then
     echo -e "${YELLOW}⚠️  Streamlit is not installed. Installing...${NC}"
-    python3 -m pip install streamlit
+    python3 -m pip install "streamlit>=1.52"
     if [ $? -ne 0 ]; then
         echo -e "${RED}❌ Failed to install Streamlit${NC}"
         read -p "Press Enter to exit..."
@@ -55,7 +55,8 @@ with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
 
 echo -e "${BLUE}🌐 Starting server on port $PORT...${NC}"
 
-# Start Streamlit in the background
+# Start Streamlit in the background, from the app folder so it reads .streamlit/config.toml
+cd "$SCRIPT_DIR"
 python3 -m streamlit run "$APP_FILE" \
     --server.port "$PORT" \
     --browser.gatherUsageStats false \
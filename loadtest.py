@@ -0,0 +1,379 @@
+#!/usr/bin/env python3
+"""
+Concurrent-session load generator for the Classical Guitar Learning Tracker
+Drives many headless app sessions at once and reports how reruns slow down
+"""
+
+import argparse
+import datetime
+import json
+import os
+import platform
+import random
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+APP_PATH = Path(__file__).resolve().parent / "app.py"
+
+# Concurrent sessions tried, one level after the other
+DEFAULT_LEVELS = [1, 2, 4, 8, 16]
+
+# Seconds each concurrency level runs for
+DEFAULT_DURATION = 30
+
+# Longest pause (seconds) between a simulated student's interactions
+DEFAULT_THINK_TIME = 0.25
+
+# Goals seeded into the throwaway database before the first level
+DEFAULT_GOALS = 200
+
+# Seconds a single rerun may take before the session counts it as failed
+RERUN_TIMEOUT = 60
+
+# Session state key the rerun counter is kept under
+RERUN_COUNTER_KEY = "_loadtest_reruns"
+
+# Script runs these interactions may take; callbacks and fragments keep them at one (checked by --check-reruns)
+RERUN_BUDGETS = {'add_task': 1, 'save_journal': 1}
+
+
+class LoadStats:
+    """Latencies and error counts shared by all sessions of one level"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # interaction -> [latency in ns], [script runs]
+        self.latencies = {}
+        self.runs = {}
+        self.exceptions = 0
+        self.script_errors = 0
+        self.lock_errors = 0
+
+    def record(self, label, elapsed_ns, runs):
+        with self._lock:
+            self.latencies.setdefault(label, []).append(elapsed_ns)
+            self.runs.setdefault(label, []).append(runs)
+
+    def count(self, name, amount=1):
+        with self._lock:
+            setattr(self, name, getattr(self, name) + amount)
+
+
+class LockErrorCounter:
+    """Text stream that counts 'database is locked' messages written to it.
+
+    The app reports failed saves with print(); everything is passed on to
+    the wrapped stream (or dropped when it is None).
+    """
+
+    def __init__(self, stream):
+        self.stream = stream
+        self.stats = None
+
+    def write(self, text):
+        if self.stats is not None and "database is locked" in text:
+            self.stats.count('lock_errors')
+        if self.stream is not None:
+            self.stream.write(text)
+        return len(text)
+
+    def flush(self):
+        if self.stream is not None:
+            self.stream.flush()
+
+
+def install_rerun_counter():
+    """Count st.rerun() calls in each session's state so reruns per interaction can be reported"""
+    import streamlit as st
+
+    original_rerun = st.rerun
+
+    def counting_rerun(*args, **kwargs):
+        st.session_state[RERUN_COUNTER_KEY] = st.session_state.get(RERUN_COUNTER_KEY, 0) + 1
+        return original_rerun(*args, **kwargs)
+
+    st.rerun = counting_rerun
+
+
+def install_shared_runtime():
+    """Let AppTest sessions run side by side in one process.
+
+    AppTest installs a mock Streamlit runtime for each run and removes it
+    when the run ends, which breaks any other session still running. With
+    this, a session that finds the runtime removed keeps using the last
+    one installed.
+    """
+    from streamlit.runtime import Runtime
+
+    last_runtime = []
+
+    def instance(cls):
+        if cls._instance is not None:
+            last_runtime[:] = [cls._instance]
+            return cls._instance
+        if last_runtime:
+            return last_runtime[0]
+        raise RuntimeError("Runtime hasn't been created!")
+
+    def exists(cls):
+        return cls._instance is not None or bool(last_runtime)
+
+    Runtime.instance = classmethod(instance)
+    Runtime.exists = classmethod(exists)
+
+
+def install_shared_script_cache():
+    """Compile app.py once for all sessions, as a real server does.
+
+    AppTest gives every run its own script cache, so concurrent sessions
+    would keep recompiling the script at the same time.
+    """
+    from streamlit.runtime.scriptrunner.script_cache import ScriptCache
+
+    shared_cache = ScriptCache()
+    original_get_bytecode = ScriptCache.get_bytecode
+
+    def get_bytecode(self, script_path):
+        return original_get_bytecode(shared_cache, script_path)
+
+    ScriptCache.get_bytecode = get_bytecode
+
+
+class StudentSession:
+    """One simulated student clicking through the app in its own AppTest"""
+
+    def __init__(self, stats, rng, think_time):
+        self.stats = stats
+        self.rng = rng
+        self.think_time = think_time
+        self.at = None
+
+    def _reruns(self):
+        state = self.at.session_state
+        return state[RERUN_COUNTER_KEY] if RERUN_COUNTER_KEY in state else 0
+
+    def interact(self, label, action=None):
+        """Perform action (a widget interaction) and time the resulting script run"""
+        reruns_before = self._reruns()
+        start = time.perf_counter_ns()
+        if action is not None:
+            action()
+        self.at.run(timeout=RERUN_TIMEOUT)
+        elapsed = time.perf_counter_ns() - start
+        self.stats.record(label, elapsed, 1 + self._reruns() - reruns_before)
+
+        if self.at.exception:
+            self.stats.count('exceptions', len(self.at.exception))
+            locked = sum("database is locked" in str(e.value) for e in self.at.exception)
+            self.stats.count('lock_errors', locked)
+            raise RuntimeError(f"{label}: {self.at.exception[0].value}")
+        if self.think_time:
+            time.sleep(self.rng.uniform(0, self.think_time))
+
+    def visit(self):
+        """One realistic pass: plan a goal, practice, reflect, look back, complete"""
+        from streamlit.testing.v1 import AppTest
+
+        if self.at is None:
+            self.at = AppTest.from_file(str(APP_PATH), default_timeout=RERUN_TIMEOUT)
+            self.interact('open_landing')
+
+        at, rng = self.at, self.rng
+        self.interact('create_goal', lambda: at.button(key="create_new_goal").click())
+        goal_id = at.session_state["selected_goal_id"]
+
+        self.interact('edit_goal', lambda: at.text_input(key="goal_name_input").input(f"Study {rng.randint(1, 40)} by Sor"))
+        self.interact('type_task', lambda: at.text_input(key=f"task_{goal_id}_0").input("Slow scales with metronome"))
+        self.interact('add_task', lambda: at.button(key=f"add_task_{goal_id}").click())
+        self.interact('type_task', lambda: at.text_input(key=f"task_{goal_id}_1").input("Rest strokes on open strings"))
+
+        journal = ""
+        for _ in range(rng.randint(1, 3)):
+            journal += f"Day {rng.randint(1, 30)}: practiced for {rng.randint(10, 90)} minutes, tone is improving.\n"
+            journal_key = f"journal_text_area_{goal_id}_{datetime.date.today().isoformat()}"
+            self.interact('edit_journal', lambda: at.text_area(key=journal_key).input(journal))
+            self.interact('save_journal', lambda: at.button(key=f"save_journal_{goal_id}").click())
+
+        self.interact('back_to_landing', lambda: at.button(key="back_to_landing").click())
+
+        # Look at an older goal on the way
+        open_keys = [button.key for button in at.button if button.key and button.key.startswith("open_goal_")]
+        other_keys = [key for key in open_keys if key != f"open_goal_{goal_id}"]
+        if other_keys:
+            self.interact('open_goal', lambda: at.button(key=rng.choice(other_keys)).click())
+            self.interact('back_to_landing', lambda: at.button(key="back_to_landing").click())
+
+        # Complete the goal created above so the database keeps its size
+        if f"complete_goal_{goal_id}" in [button.key for button in at.button]:
+            self.interact('complete_goal', lambda: at.button(key=f"complete_goal_{goal_id}").click())
+            self.interact('confirm_complete', lambda: at.button(key=f"confirm_yes_{goal_id}").click())
+
+    def run_until(self, deadline):
+        while time.monotonic() < deadline:
+            try:
+                self.visit()
+            except Exception as e:
+                # Start over on a fresh page, as a student would after an error
+                self.stats.count('script_errors')
+                print(f"⚠️ Session restarted after: {e}", file=sys.stderr)
+                self.at = None
+
+
+def run_level(sessions, duration, think_time, seed, output):
+    """Run sessions concurrent students for duration seconds; returns the level report"""
+    from autosave import get_queue
+    from benchmark import summarize
+
+    stats = LoadStats()
+    output.stats = stats
+    deadline = time.monotonic() + duration
+    threads = [
+        threading.Thread(
+            target=StudentSession(stats, random.Random(seed * 1000 + i), think_time).run_until,
+            args=(deadline,),
+            name=f"student-{i}",
+        )
+        for i in range(sessions)
+    ]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    get_queue().flush()
+    elapsed = time.perf_counter() - started
+
+    all_latencies = [ns for samples in stats.latencies.values() for ns in samples]
+    total_runs = sum(sum(runs) for runs in stats.runs.values())
+    return {
+        'sessions': sessions,
+        'duration_s': elapsed,
+        'interactions': len(all_latencies),
+        'interactions_per_sec': len(all_latencies) / elapsed,
+        'script_runs': total_runs,
+        'lock_errors': stats.lock_errors,
+        'exceptions': stats.exceptions,
+        'script_errors': stats.script_errors,
+        'latency': summarize(all_latencies) if all_latencies else None,
+        'by_interaction': {
+            label: {**summarize(samples), 'reruns_mean': sum(stats.runs[label]) / len(stats.runs[label])}
+            for label, samples in sorted(stats.latencies.items())
+        },
+    }
+
+
+def check_reruns(seed=0):
+    """Script runs of the RERUN_BUDGETS interactions in one session, as problems (empty when all fit)"""
+    stats = LoadStats()
+    StudentSession(stats, random.Random(seed), think_time=0).visit()
+    problems = []
+    for label, budget in RERUN_BUDGETS.items():
+        runs = stats.runs.get(label)
+        if not runs:
+            problems.append(f"{label}: never performed")
+        elif max(runs) > budget:
+            problems.append(f"{label}: {max(runs)} script runs (budget {budget})")
+    return problems
+
+
+def main():
+    """Command line entry point"""
+    parser = argparse.ArgumentParser(description="Load-test the guitar tracker with concurrent headless sessions")
+    parser.add_argument("--sessions", type=int, nargs="+", default=DEFAULT_LEVELS,
+                        help="concurrent sessions per level (default: %(default)s)")
+    parser.add_argument("--duration", type=float, default=DEFAULT_DURATION,
+                        help="seconds per level (default: %(default)s)")
+    parser.add_argument("--think-time", type=float, default=DEFAULT_THINK_TIME,
+                        help="longest random pause between interactions in seconds (default: %(default)s)")
+    parser.add_argument("--goals", type=int, default=DEFAULT_GOALS,
+                        help="synthetic goals seeded before the first level (default: %(default)s)")
+    parser.add_argument("--database", help="run against this existing database instead of a seeded throwaway one")
+    parser.add_argument("--seed", type=int, default=0, help="random seed for the sessions and synthetic data")
+    parser.add_argument("--verbose", action="store_true", help="show the app's own output")
+    parser.add_argument("--output", help="write the JSON report here instead of stdout")
+    parser.add_argument("--check-reruns", action="store_true",
+                        help="run one session and fail if add-task or save-journal take more script runs than budgeted")
+    args = parser.parse_args()
+
+    workdir = None
+    if args.database:
+        db_path = Path(args.database).resolve()
+    else:
+        workdir = tempfile.TemporaryDirectory(prefix="guitar_tracker_load_")
+        db_path = Path(workdir.name) / "load.db"
+    # Must be set before the app's modules are imported
+    os.environ["GUITAR_TRACKER_DB"] = str(db_path)
+
+    import storage
+    from benchmark import seed_database
+
+    if workdir is not None and args.goals:
+        seed_database(db_path, args.goals, args.seed)
+    install_rerun_counter()
+    install_shared_runtime()
+    install_shared_script_cache()
+
+    if args.check_reruns:
+        real_stdout = sys.stdout
+        sys.stdout = LockErrorCounter(sys.stderr if args.verbose else None)
+        try:
+            problems = check_reruns(args.seed)
+        finally:
+            sys.stdout = real_stdout
+            if workdir is not None:
+                workdir.cleanup()
+        for problem in problems:
+            print(f"❌ {problem}")
+        if not problems:
+            print(f"✅ {', '.join(RERUN_BUDGETS)} stay within their script-run budgets.")
+        return 1 if problems else 0
+
+    report = {
+        'meta': {
+            'started_at': datetime.datetime.now().isoformat(timespec='seconds'),
+            'engine': storage.STORAGE_ENGINE,
+            'database': str(db_path) if args.database else None,
+            'seeded_goals': args.goals if workdir is not None else None,
+            'duration_s': args.duration,
+            'think_time_s': args.think_time,
+            'python': platform.python_version(),
+            'sqlite': sqlite3.sqlite_version,
+            'platform': platform.platform(),
+        },
+        'levels': [],
+    }
+
+    # The app prints as it saves; count lock errors in that output and keep stdout for the report
+    real_stdout = sys.stdout
+    sys.stdout = output = LockErrorCounter(sys.stderr if args.verbose else None)
+    try:
+        print(f"{'sessions':>8} {'int/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'locked':>7} {'errors':>7}",
+              file=sys.stderr)
+        for sessions in args.sessions:
+            level = run_level(sessions, args.duration, args.think_time, args.seed, output)
+            report['levels'].append(level)
+            latency = level['latency'] or {'p50_ms': 0, 'p95_ms': 0, 'p99_ms': 0}
+            print(f"{sessions:>8} {level['interactions_per_sec']:>8.1f} {latency['p50_ms']:>8.1f} "
+                  f"{latency['p95_ms']:>8.1f} {latency['p99_ms']:>8.1f} {level['lock_errors']:>7} "
+                  f"{level['exceptions'] + level['script_errors']:>7}", file=sys.stderr)
+    finally:
+        sys.stdout = real_stdout
+        if workdir is not None:
+            workdir.cleanup()
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as out:
+            json.dump(report, out, indent=2)
+        print(f"✅ Wrote {len(report['levels'])} levels to {args.output}", file=sys.stderr)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,632 @@
+#!/usr/bin/env python3
+"""
+Versioned schema migrations for the Classical Guitar Learning Tracker
+The schema version lives in PRAGMA user_version; each migration runs once
+"""
+
+import argparse
+import sqlite3
+import sys
+import threading
+
+import text_codec
+from db import current_database, transaction
+
+# Ordered list of (version, description, function) - see migration()
+MIGRATIONS = []
+
+# Databases already brought up to date by this process, and the lock each one is upgraded under
+_schema_ready = set()
+_schema_locks = {}
+_schema_lock = threading.Lock()
+
+
+def migration(version, description):
+    """Register a migration function under the next schema version"""
+    def register(func):
+        expected = len(MIGRATIONS) + 1
+        if version != expected:
+            raise ValueError(f"Migration {version} registered out of order (expected {expected})")
+        MIGRATIONS.append((version, description, func))
+        return func
+    return register
+
+
+@migration(1, "Create goals/tasks/journal_entries and add goals.header_text")
+def _base_schema(cursor):
+    # Goals table
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS goals (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            month INTEGER,
+            year INTEGER,
+            name TEXT,
+            description TEXT,
+            completion_criteria TEXT,
+            header_text TEXT DEFAULT "",
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+
+    # Tasks table
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS tasks (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            goal_id INTEGER,
+            task_description TEXT,
+            task_order INTEGER,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (goal_id) REFERENCES goals (id)
+        )
+    ''')
+
+    # Journal entries table
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS journal_entries (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            goal_id INTEGER,
+            content TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (goal_id) REFERENCES goals (id)
+        )
+    ''')
+
+    # Databases created before header_text existed need the column added
+    cursor.execute("PRAGMA table_info(goals)")
+    columns = [column[1] for column in cursor.fetchall()]
+    if 'header_text' not in columns:
+        cursor.execute('ALTER TABLE goals ADD COLUMN header_text TEXT DEFAULT ""')
+
+
+@migration(2, "Add indexes for per-goal task/journal lookups and month lookups")
+def _hot_path_indexes(cursor):
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_tasks_goal_order ON tasks (goal_id, task_order)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_journal_goal_updated ON journal_entries (goal_id, updated_at)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_goals_year_month ON goals (year, month)')
+
+
+@migration(3, "Add append-only journal revision history")
+def _journal_revisions(cursor):
+    # kind is 'snapshot' (payload is the full text) or 'delta' (JSON edit against the previous revision)
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS journal_revisions (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            goal_id INTEGER,
+            revision INTEGER,
+            kind TEXT,
+            payload TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (goal_id) REFERENCES goals (id)
+        )
+    ''')
+    cursor.execute('CREATE UNIQUE INDEX IF NOT EXISTS idx_journal_revisions_goal_revision ON journal_revisions (goal_id, revision)')
+
+
+@migration(4, "Add FTS5 search index over goals, tasks and journals")
+def _search_index(cursor):
+    # Index rows use rowid = source id * 4 + kind code (goal 0, task 1, journal 2),
+    # so triggers can find a source row's entry without scanning the index
+    try:
+        cursor.execute('''
+            CREATE VIRTUAL TABLE IF NOT EXISTS search_index USING fts5(
+                title, body, goal_id UNINDEXED, kind UNINDEXED,
+                tokenize = 'unicode61 remove_diacritics 2',
+                prefix = '2 3'
+            )
+        ''')
+    except sqlite3.OperationalError as e:
+        # SQLite built without FTS5 - the app runs without search
+        print(f"Search disabled: {e}")
+        return
+
+    # Goal names weigh five times as much as body text in the ranking
+    cursor.execute("INSERT INTO search_index (search_index, rank) VALUES ('rank', 'bm25(5.0, 1.0)')")
+
+    for statement in SEARCH_TRIGGERS:
+        cursor.execute(statement)
+
+    # Index everything written before search existed
+    cursor.execute('''
+        INSERT INTO search_index (rowid, title, body, goal_id, kind)
+        SELECT id * 4, name, description, id, 'goal' FROM goals
+    ''')
+    cursor.execute('''
+        INSERT INTO search_index (rowid, title, body, goal_id, kind)
+        SELECT id * 4 + 1, '', task_description, goal_id, 'task' FROM tasks
+    ''')
+    cursor.execute('''
+        INSERT INTO search_index (rowid, title, body, goal_id, kind)
+        SELECT id * 4 + 2, '', content, goal_id, 'journal' FROM journal_entries
+    ''')
+
+
+@migration(5, "Give every goal a stable external id for export/import")
+def _goal_external_ids(cursor):
+    cursor.execute('ALTER TABLE goals ADD COLUMN external_id TEXT')
+    cursor.execute('UPDATE goals SET external_id = lower(hex(randomblob(16))) WHERE external_id IS NULL')
+    cursor.execute('CREATE UNIQUE INDEX IF NOT EXISTS idx_goals_external_id ON goals (external_id)')
+    # New goals get an id without every INSERT having to supply one
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS goals_assign_external_id AFTER INSERT ON goals
+        WHEN new.external_id IS NULL BEGIN
+            UPDATE goals SET external_id = lower(hex(randomblob(16))) WHERE id = new.id;
+        END
+    ''')
+
+
+@migration(6, "Cascade goal deletes to tasks, journal entries and journal revisions")
+def _cascade_goal_deletes(cursor):
+    # SQLite cannot alter a foreign key, so each child table is rebuilt.
+    # Rows whose goal no longer exists would break the new constraint and are dropped.
+    cursor.execute('''
+        CREATE TABLE tasks_new (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            goal_id INTEGER,
+            task_description TEXT,
+            task_order INTEGER,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (goal_id) REFERENCES goals (id) ON DELETE CASCADE
+        )
+    ''')
+    cursor.execute('''
+        INSERT INTO tasks_new (id, goal_id, task_description, task_order, created_at)
+        SELECT id, goal_id, task_description, task_order, created_at FROM tasks
+        WHERE goal_id IN (SELECT id FROM goals)
+    ''')
+
+    cursor.execute('''
+        CREATE TABLE journal_entries_new (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            goal_id INTEGER,
+            content TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (goal_id) REFERENCES goals (id) ON DELETE CASCADE
+        )
+    ''')
+    cursor.execute('''
+        INSERT INTO journal_entries_new (id, goal_id, content, created_at, updated_at)
+        SELECT id, goal_id, content, created_at, updated_at FROM journal_entries
+        WHERE goal_id IN (SELECT id FROM goals)
+    ''')
+
+    cursor.execute('''
+        CREATE TABLE journal_revisions_new (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            goal_id INTEGER,
+            revision INTEGER,
+            kind TEXT,
+            payload TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (goal_id) REFERENCES goals (id) ON DELETE CASCADE
+        )
+    ''')
+    cursor.execute('''
+        INSERT INTO journal_revisions_new (id, goal_id, revision, kind, payload, created_at)
+        SELECT id, goal_id, revision, kind, payload, created_at FROM journal_revisions
+        WHERE goal_id IN (SELECT id FROM goals)
+    ''')
+
+    for table in ('tasks', 'journal_entries', 'journal_revisions'):
+        cursor.execute(f'DROP TABLE {table}')
+        cursor.execute(f'ALTER TABLE {table}_new RENAME TO {table}')
+
+    # Indexes and triggers went with the old tables
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_tasks_goal_order ON tasks (goal_id, task_order)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_journal_goal_updated ON journal_entries (goal_id, updated_at)')
+    cursor.execute('CREATE UNIQUE INDEX IF NOT EXISTS idx_journal_revisions_goal_revision ON journal_revisions (goal_id, revision)')
+    cursor.execute("SELECT name FROM sqlite_master WHERE name = 'search_index'")
+    if cursor.fetchone():
+        for statement in SEARCH_TRIGGERS:
+            cursor.execute(statement)
+        # Drop index entries of the orphaned rows that were not copied
+        cursor.execute('''
+            DELETE FROM search_index WHERE kind IN ('task', 'journal')
+            AND goal_id NOT IN (SELECT id FROM goals)
+        ''')
+
+
+@migration(7, "Split journals into dated entries and key journal revisions by entry")
+def _dated_journal_entries(cursor):
+    # Saves used to update every journal row of a goal, so extra rows only repeat the latest text
+    cursor.execute('''
+        DELETE FROM journal_entries
+        WHERE id NOT IN (SELECT MAX(id) FROM journal_entries GROUP BY goal_id)
+    ''')
+
+    # A goal's existing journal becomes one entry dated the day it was started. Timestamps
+    # are stored in UTC, while journal_date() names the local day
+    cursor.execute('ALTER TABLE journal_entries ADD COLUMN entry_date TEXT')
+    cursor.execute("UPDATE journal_entries SET entry_date = date(created_at, 'localtime')")
+    cursor.execute('ALTER TABLE journal_revisions ADD COLUMN entry_date TEXT')
+    cursor.execute('''
+        UPDATE journal_revisions SET entry_date = coalesce(
+            (SELECT entry_date FROM journal_entries WHERE journal_entries.goal_id = journal_revisions.goal_id),
+            date(created_at, 'localtime'))
+    ''')
+
+    # Empty rows were placeholders made along with each new goal
+    cursor.execute("DELETE FROM journal_entries WHERE content = '' OR content IS NULL")
+
+    cursor.execute('DROP INDEX IF EXISTS idx_journal_goal_updated')
+    cursor.execute('CREATE UNIQUE INDEX IF NOT EXISTS idx_journal_goal_date ON journal_entries (goal_id, entry_date)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_journal_revisions_entry ON journal_revisions (goal_id, entry_date, revision)')
+
+
+@migration(8, "Compress long journal entries, journal history and goal descriptions")
+def _compressed_text(cursor):
+    # The search triggers index compressed values as empty text, so they are replaced before
+    # any row is compressed and the plain text is put back in the index afterwards
+    _replace_text_search_triggers(cursor)
+    for table, column in text_codec.COMPRESSED_COLUMNS:
+        text_codec.compress_column(cursor, table, column)
+    index_compressed_rows(cursor)
+    for line in text_codec.format_report(text_codec.compression_report(cursor)):
+        print(f"  {line}")
+
+
+@migration(9, "Add practice session log with daily, weekly and monthly rollups")
+def _practice_sessions(cursor):
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS practice_sessions (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            goal_id INTEGER NOT NULL,
+            task_id INTEGER,
+            started_at TEXT NOT NULL,
+            duration_minutes INTEGER NOT NULL,
+            tempo INTEGER,
+            notes TEXT NOT NULL DEFAULT '',
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (goal_id) REFERENCES goals (id) ON DELETE CASCADE,
+            FOREIGN KEY (task_id) REFERENCES tasks (id) ON DELETE SET NULL
+        )
+    ''')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_practice_sessions_goal ON practice_sessions (goal_id, started_at)')
+    # Deleting a task looks up its sessions to unlink them
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_practice_sessions_task ON practice_sessions (task_id)')
+
+    # Totals per goal and period, so summaries read one row per period instead of every session
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS practice_rollups (
+            goal_id INTEGER NOT NULL,
+            period TEXT NOT NULL,
+            period_start TEXT NOT NULL,
+            sessions INTEGER NOT NULL,
+            minutes INTEGER NOT NULL,
+            PRIMARY KEY (goal_id, period, period_start),
+            FOREIGN KEY (goal_id) REFERENCES goals (id) ON DELETE CASCADE
+        ) WITHOUT ROWID
+    ''')
+    for statement in PRACTICE_TRIGGERS:
+        cursor.execute(statement)
+
+
+def _replace_text_search_triggers(cursor):
+    """Re-create the search triggers of the compressible columns from SEARCH_TRIGGERS"""
+    if not has_search_index(cursor):
+        return
+    for trigger in ('goals_search_insert', 'goals_search_update', 'journal_search_insert', 'journal_search_update'):
+        cursor.execute(f'DROP TRIGGER IF EXISTS {trigger}')
+    for statement in SEARCH_TRIGGERS:
+        cursor.execute(statement)
+
+
+def index_compressed_rows(cursor, goal_ids=None):
+    """Put the plain text of compressed descriptions and journal entries (of goal_ids, default all) in the search index"""
+    if not has_search_index(cursor):
+        return
+    goal_filter = '' if goal_ids is None else f"AND {{}} IN ({', '.join('?' for _ in goal_ids)})"
+    params = [] if goal_ids is None else list(goal_ids)
+    for kind, sql in (('goal', "SELECT id, description FROM goals WHERE typeof(description) = 'blob' "
+                               + goal_filter.format('id')),
+                      ('journal', "SELECT id, content FROM journal_entries WHERE typeof(content) = 'blob' "
+                                  + goal_filter.format('goal_id'))):
+        cursor.execute(sql, params)
+        for row_id, value in cursor.fetchall():
+            index_plain_text(cursor, kind, row_id, text_codec.decode_text(value))
+
+
+def has_search_index(cursor):
+    """Whether the database has the full-text search index (SQLite may lack FTS5)"""
+    cursor.execute("SELECT name FROM sqlite_master WHERE name = 'search_index'")
+    return cursor.fetchone() is not None
+
+
+def index_plain_text(cursor, kind, row_id, text):
+    """Give the search index the plain text of a goal ('goal') or journal entry ('journal') stored compressed.
+
+    Triggers must not depend on the app's SQL functions, so they index a
+    compressed value as empty text; whoever writes one calls this in the
+    same transaction.
+    """
+    if has_search_index(cursor):
+        code = {'goal': 0, 'journal': 2}[kind]
+        cursor.execute('UPDATE search_index SET body = ? WHERE rowid = ?', (text, row_id * 4 + code))
+
+
+# Triggers keeping search_index in step with the source tables. A newly written
+# compressed description or journal entry (BLOB) is indexed as '' - see index_plain_text()
+SEARCH_TRIGGERS = [
+    '''
+    CREATE TRIGGER IF NOT EXISTS goals_search_insert AFTER INSERT ON goals BEGIN
+        INSERT INTO search_index (rowid, title, body, goal_id, kind)
+        VALUES (new.id * 4, new.name, CASE WHEN typeof(new.description) = 'blob' THEN '' ELSE new.description END,
+                new.id, 'goal');
+    END
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS goals_search_update AFTER UPDATE OF name, description ON goals BEGIN
+        UPDATE search_index SET title = new.name,
+            body = CASE WHEN typeof(new.description) != 'blob' THEN new.description
+                        WHEN new.description IS old.description THEN body ELSE '' END
+        WHERE rowid = new.id * 4;
+    END
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS goals_search_delete AFTER DELETE ON goals BEGIN
+        DELETE FROM search_index WHERE rowid = old.id * 4;
+    END
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS tasks_search_insert AFTER INSERT ON tasks BEGIN
+        INSERT INTO search_index (rowid, title, body, goal_id, kind)
+        VALUES (new.id * 4 + 1, '', new.task_description, new.goal_id, 'task');
+    END
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS tasks_search_update AFTER UPDATE OF task_description, goal_id ON tasks BEGIN
+        UPDATE search_index SET body = new.task_description, goal_id = new.goal_id WHERE rowid = new.id * 4 + 1;
+    END
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS tasks_search_delete AFTER DELETE ON tasks BEGIN
+        DELETE FROM search_index WHERE rowid = old.id * 4 + 1;
+    END
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS journal_search_insert AFTER INSERT ON journal_entries BEGIN
+        INSERT INTO search_index (rowid, title, body, goal_id, kind)
+        VALUES (new.id * 4 + 2, '', CASE WHEN typeof(new.content) = 'blob' THEN '' ELSE new.content END,
+                new.goal_id, 'journal');
+    END
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS journal_search_update AFTER UPDATE OF content, goal_id ON journal_entries BEGIN
+        UPDATE search_index SET body = CASE WHEN typeof(new.content) != 'blob' THEN new.content
+                                            WHEN new.content IS old.content THEN body ELSE '' END,
+            goal_id = new.goal_id
+        WHERE rowid = new.id * 4 + 2;
+    END
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS journal_search_delete AFTER DELETE ON journal_entries BEGIN
+        DELETE FROM search_index WHERE rowid = old.id * 4 + 2;
+    END
+    ''',
+]
+
+
+# Start of the rollup period containing a session, as SQL over its {row}
+# (new or old); weeks start on Monday. storage.practice_periods() is the same in Python.
+PRACTICE_PERIOD_STARTS = {
+    'day': "date({row}.started_at)",
+    'week': "date({row}.started_at, '-6 days', 'weekday 1')",
+    'month': "date({row}.started_at, 'start of month')",
+}
+
+
+def _rollup_periods(row):
+    """SQL VALUES list of a session's (period, period_start) pairs"""
+    return ', '.join(f"('{period}', {start.format(row=row)})" for period, start in PRACTICE_PERIOD_STARTS.items())
+
+
+def _add_to_rollups(row):
+    """Trigger statement counting a session into its rollup rows"""
+    return f'''
+        INSERT INTO practice_rollups (goal_id, period, period_start, sessions, minutes)
+        SELECT {row}.goal_id, column1, column2, 1, {row}.duration_minutes FROM (VALUES {_rollup_periods(row)}) WHERE true
+        ON CONFLICT (goal_id, period, period_start) DO UPDATE SET
+            sessions = sessions + 1, minutes = minutes + excluded.minutes;
+    '''
+
+
+def _remove_from_rollups(row):
+    """Trigger statements taking a session out of its rollup rows, dropping rows left empty"""
+    return f'''
+        UPDATE practice_rollups SET sessions = sessions - 1, minutes = minutes - {row}.duration_minutes
+        WHERE goal_id = {row}.goal_id AND (period, period_start) IN (VALUES {_rollup_periods(row)});
+        DELETE FROM practice_rollups
+        WHERE goal_id = {row}.goal_id AND sessions <= 0 AND (period, period_start) IN (VALUES {_rollup_periods(row)});
+    '''
+
+
+# Triggers keeping practice_rollups in step with practice_sessions, in the writing transaction
+PRACTICE_TRIGGERS = [
+    f'''
+    CREATE TRIGGER IF NOT EXISTS practice_rollups_insert AFTER INSERT ON practice_sessions BEGIN
+        {_add_to_rollups('new')}
+    END
+    ''',
+    f'''
+    CREATE TRIGGER IF NOT EXISTS practice_rollups_update
+    AFTER UPDATE OF goal_id, started_at, duration_minutes ON practice_sessions BEGIN
+        {_remove_from_rollups('old')}
+        {_add_to_rollups('new')}
+    END
+    ''',
+    f'''
+    CREATE TRIGGER IF NOT EXISTS practice_rollups_delete AFTER DELETE ON practice_sessions BEGIN
+        {_remove_from_rollups('old')}
+    END
+    ''',
+]
+
+
+# Queries run on every page render, keyed by the SQLiteStorage method issuing them.
+# check_query_plans() makes sure none of them fall back to a table scan.
+HOT_QUERIES = {
+    'get_current_goal': ('SELECT * FROM goals WHERE month = ? AND year = ?', (1, 2000)),
+    'get_goal_summaries (first page)': (
+        'SELECT id, name, substr(decode_text(description), 1, ?), created_at, year, month FROM goals '
+        'ORDER BY year DESC, month DESC, id DESC LIMIT ?', (101, 21)),
+    'get_goal_summaries (next page)': (
+        'SELECT id, name, substr(decode_text(description), 1, ?), created_at, year, month FROM goals '
+        'WHERE (year, month, id) < (?, ?, ?) ORDER BY year DESC, month DESC, id DESC LIMIT ?',
+        (101, 2000, 1, 1, 21)),
+    'get_goal_by_id': ('SELECT * FROM goals WHERE id = ?', (1,)),
+    'get_tasks': ('SELECT * FROM tasks WHERE goal_id = ? ORDER BY task_order', (1,)),
+    'load_goal_bundle (journal)': (
+        'SELECT content FROM journal_entries WHERE goal_id = ? AND entry_date = ?', (1, '2000-01-01')),
+    'get_journal_entries': (
+        "SELECT entry_date, content FROM journal_entries WHERE goal_id = ? AND entry_date < ? AND content != '' "
+        "ORDER BY entry_date DESC LIMIT ?", (1, '2000-01-01', 7)),
+    'save_journal_content': (
+        'SELECT id, content FROM journal_entries WHERE goal_id = ? AND entry_date = ?', (1, '2000-01-01')),
+    'save_journal_content (revision)': ('SELECT MAX(revision) FROM journal_revisions WHERE goal_id = ?', (1,)),
+    'save_journal_content (entry revisions)': (
+        'SELECT COUNT(*) FROM journal_revisions WHERE goal_id = ? AND entry_date = ?', (1, '2000-01-01')),
+    'get_journal_revision (entry)': (
+        'SELECT entry_date FROM journal_revisions WHERE goal_id = ? AND revision = ?', (1, 1)),
+    'get_journal_revision (snapshot)': (
+        "SELECT MAX(revision) FROM journal_revisions WHERE goal_id = ? AND entry_date = ? AND revision <= ? "
+        "AND kind = 'snapshot'", (1, '2000-01-01', 1)),
+    'get_journal_revision (replay)': (
+        'SELECT kind, payload FROM journal_revisions WHERE goal_id = ? AND entry_date = ? '
+        'AND revision BETWEEN ? AND ? ORDER BY revision', (1, '2000-01-01', 1, 1)),
+    'get_journal_revisions': (
+        'SELECT revision, entry_date, kind, length(CAST(payload AS BLOB)), created_at FROM journal_revisions '
+        'WHERE goal_id = ? ORDER BY revision DESC LIMIT ?', (1, 50)),
+    # The per-goal deletes ON DELETE CASCADE runs for each deleted goal
+    'delete_goals (cascade to tasks)': ('DELETE FROM tasks WHERE goal_id = ?', (1,)),
+    'delete_goals (cascade to journal)': ('DELETE FROM journal_entries WHERE goal_id = ?', (1,)),
+    'delete_goals (cascade to journal revisions)': ('DELETE FROM journal_revisions WHERE goal_id = ?', (1,)),
+    'delete_goals (cascade to practice sessions)': ('DELETE FROM practice_sessions WHERE goal_id = ?', (1,)),
+    'delete_goals (cascade to practice rollups)': ('DELETE FROM practice_rollups WHERE goal_id = ?', (1,)),
+    # Deleting a task unlinks its practice sessions (ON DELETE SET NULL)
+    'save_tasks (unlink practice sessions)': ('UPDATE practice_sessions SET task_id = NULL WHERE task_id = ?', (1,)),
+    'log_practice_session (rollup)': (
+        'UPDATE practice_rollups SET sessions = sessions + 1 '
+        'WHERE goal_id = ? AND period = ? AND period_start = ?', (1, 'day', '2000-01-01')),
+    'get_practice_rollups': (
+        'SELECT period_start, sessions, minutes FROM practice_rollups '
+        'WHERE goal_id = ? AND period = ? AND period_start >= ? ORDER BY period_start DESC', (1, 'day', '2000-01-01')),
+    'search_goals': (
+        "SELECT search_index.goal_id, goals.name, search_index.kind, "
+        "snippet(search_index, -1, '[', ']', '…', 12) "
+        "FROM search_index JOIN goals ON goals.id = search_index.goal_id "
+        "WHERE search_index MATCH ? ORDER BY rank LIMIT ?", ('"bach"*', 50)),
+}
+
+
+def check_query_plans():
+    """Run EXPLAIN QUERY PLAN on every hot query.
+
+    Returns a list of (name, plan detail) for each step that scans a table
+    or sorts in a temporary b-tree; an empty list means all plans are good.
+    A scan that walks an index in ORDER BY order is allowed for LIMIT
+    queries, since it stops after the first page of rows, and so is a
+    full-text MATCH lookup (reported as a SCAN of the virtual table).
+    """
+    problems = []
+    with transaction() as cursor:
+        cursor.execute("SELECT name FROM sqlite_master WHERE name = 'search_index'")
+        has_search = cursor.fetchone() is not None
+        for name, (sql, params) in HOT_QUERIES.items():
+            if 'search_index' in sql and not has_search:
+                continue
+            limited = ' LIMIT ' in sql.upper()
+            cursor.execute(f"EXPLAIN QUERY PLAN {sql}", params)
+            for row in cursor.fetchall():
+                detail = row[-1]
+                if 'TEMP B-TREE' in detail:
+                    problems.append((name, detail))
+                elif not detail.startswith('SCAN'):
+                    continue
+                elif 'VIRTUAL TABLE INDEX' in detail and ':M' in detail:
+                    continue
+                elif not (limited and 'USING' in detail and 'INDEX' in detail):
+                    problems.append((name, detail))
+    return problems
+
+
+def get_schema_version(cursor):
+    """Current schema version of the database"""
+    cursor.execute("PRAGMA user_version")
+    return cursor.fetchone()[0]
+
+
+def upgrade(dry_run=False):
+    """Apply pending migrations in order.
+
+    Returns the (version, description) pairs that were applied, or that
+    would be applied when dry_run is set.
+    """
+    # The write lock keeps two processes from migrating at the same time
+    with transaction(write=True) as cursor:
+        current = get_schema_version(cursor)
+        pending = [(version, description) for version, description, _ in MIGRATIONS if version > current]
+        if dry_run:
+            return pending
+        for version, description, func in MIGRATIONS:
+            if version <= current:
+                continue
+            print(f"Migrating database to version {version}: {description}")
+            func(cursor)
+            cursor.execute(f"PRAGMA user_version = {int(version)}")
+    return pending
+
+
+def ensure_schema():
+    """Bring the current database's schema up to date, once per process.
+
+    Each database is upgraded under its own lock, so a slow migration of
+    one student's database does not hold up the first use of another's.
+    """
+    db_path = current_database()
+    if db_path in _schema_ready:
+        return
+    with _schema_lock:
+        lock = _schema_locks.setdefault(db_path, threading.Lock())
+    with lock:
+        if db_path not in _schema_ready:
+            upgrade()
+            _schema_ready.add(db_path)
+
+
+def main():
+    """Command line entry point: report or apply pending migrations"""
+    parser = argparse.ArgumentParser(description="Upgrade the guitar tracker database schema")
+    parser.add_argument("--dry-run", action="store_true", help="list pending migrations without applying them")
+    parser.add_argument("--check-plans", action="store_true", help="fail if any hot query plan scans a table")
+    args = parser.parse_args()
+
+    if args.check_plans:
+        ensure_schema()
+        problems = check_query_plans()
+        for name, detail in problems:
+            print(f"❌ {name}: {detail}")
+        if problems:
+            return 1
+        print(f"✅ All {len(HOT_QUERIES)} hot queries use an index.")
+        return 0
+
+    with transaction() as cursor:
+        current = get_schema_version(cursor)
+    print(f"Schema version: {current} (latest: {len(MIGRATIONS)})")
+
+    pending = upgrade(dry_run=args.dry_run)
+    if not pending:
+        print("Database is up to date.")
+    elif args.dry_run:
+        print("Pending migrations:")
+        for version, description in pending:
+            print(f"  {version}: {description}")
+    else:
+        print(f"Applied {len(pending)} migration(s).")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
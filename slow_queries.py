@@ -0,0 +1,239 @@
+#!/usr/bin/env python3
+"""
+Slow-query log for the Classical Guitar Learning Tracker
+Captures statements over a time threshold with their query plans, and summarizes the log
+"""
+
+import argparse
+import json
+import logging
+import logging.handlers
+import os
+import re
+import sqlite3
+import sys
+import time
+from pathlib import Path
+
+# Statements taking at least this many milliseconds are logged (0 turns the log off)
+SLOW_QUERY_MS = float(os.environ.get("GUITAR_TRACKER_SLOW_QUERY_MS") or 100)
+
+ENABLED = SLOW_QUERY_MS > 0
+
+# JSON-lines log, rotated at SLOW_LOG_MAX_BYTES with SLOW_LOG_BACKUPS old files kept
+SLOW_LOG_PATH = Path(os.environ.get("GUITAR_TRACKER_SLOW_LOG") or Path.home() / "guitar_tracker_slow_queries.log")
+SLOW_LOG_MAX_BYTES = 1024 * 1024
+SLOW_LOG_BACKUPS = 3
+
+# Statements that have no useful query plan
+_NO_PLAN = re.compile(r'^\s*(BEGIN|COMMIT|ROLLBACK|PRAGMA|CREATE|DROP|ALTER|SAVEPOINT|RELEASE)\b', re.IGNORECASE)
+
+# Source files whose frames are skipped when looking for the calling function
+_INFRASTRUCTURE_FILES = {'db.py', 'slow_queries.py', 'diagnostics.py', 'contextlib.py'}
+
+_logger = None
+
+
+def _get_logger():
+    global _logger
+    if _logger is None:
+        logger = logging.getLogger("guitar_tracker.slow_queries")
+        logger.propagate = False
+        handler = logging.handlers.RotatingFileHandler(
+            SLOW_LOG_PATH, maxBytes=SLOW_LOG_MAX_BYTES, backupCount=SLOW_LOG_BACKUPS, encoding="utf-8")
+        handler.setFormatter(logging.Formatter("%(message)s"))
+        logger.addHandler(handler)
+        logger.setLevel(logging.INFO)
+        _logger = logger
+    return _logger
+
+
+def fingerprint(sql):
+    """Statement text with whitespace collapsed and literals and IN-lists folded"""
+    sql = re.sub(r'\s+', ' ', sql).strip()
+    sql = re.sub(r"'(?:[^']|'')*'", "'?'", sql)
+    sql = re.sub(r'\b\d+\b', 'N', sql)
+    return re.sub(r'\(\s*\?(?:\s*,\s*\?)+\s*\)', '(?, ...)', sql)
+
+
+def parameter_shape(parameters):
+    """Types (and sizes of text and blobs) of bound parameters, never their values"""
+    def shape(value):
+        if isinstance(value, (str, bytes)):
+            return f"{type(value).__name__}({len(value)})"
+        return type(value).__name__
+
+    if isinstance(parameters, dict):
+        return {name: shape(value) for name, value in parameters.items()}
+    return [shape(value) for value in parameters]
+
+
+def calling_function():
+    """module.function:line of the nearest caller outside the database layer"""
+    frame = sys._getframe(1)
+    while frame is not None:
+        filename = os.path.basename(frame.f_code.co_filename)
+        if filename not in _INFRASTRUCTURE_FILES:
+            return f"{filename[:-3] if filename.endswith('.py') else filename}.{frame.f_code.co_name}:{frame.f_lineno}"
+        frame = frame.f_back
+    return None
+
+
+def query_plan(connection, sql, parameters):
+    """EXPLAIN QUERY PLAN rows of a statement as text lines, or None"""
+    if _NO_PLAN.match(sql):
+        return None
+    try:
+        rows = connection.execute(f"EXPLAIN QUERY PLAN {sql}", parameters).fetchall()
+    except sqlite3.Error:
+        return None
+    return [detail for _, _, _, detail in rows]
+
+
+class SlowQueryCursor:
+    """sqlite3 cursor wrapper logging statements that take SLOW_QUERY_MS or longer.
+
+    A SELECT's time includes fetching its rows, since SQLite does most of
+    the work while rows are stepped through.
+    """
+
+    __slots__ = ('_cursor', '_statement')
+
+    def __init__(self, cursor):
+        self._cursor = cursor
+        # (sql, parameters, row count, milliseconds so far) of the last unlogged statement
+        self._statement = None
+
+    def _timed(self, sql, parameters, rows, run):
+        start = time.perf_counter()
+        run()
+        ms = (time.perf_counter() - start) * 1000
+        self._statement = None
+        if ms >= SLOW_QUERY_MS:
+            self._log(sql, parameters, rows, ms)
+        else:
+            self._statement = (sql, parameters, rows, ms)
+
+    def execute(self, sql, parameters=()):
+        self._timed(sql, parameters, None, lambda: self._cursor.execute(sql, parameters))
+        return self
+
+    def executemany(self, sql, seq_of_parameters):
+        seq_of_parameters = list(seq_of_parameters)
+        self._timed(sql, seq_of_parameters[0] if seq_of_parameters else (), len(seq_of_parameters),
+                    lambda: self._cursor.executemany(sql, seq_of_parameters))
+        return self
+
+    def _fetched(self, start):
+        if self._statement is None:
+            return
+        sql, parameters, rows, ms = self._statement
+        ms += (time.perf_counter() - start) * 1000
+        self._statement = (sql, parameters, rows, ms)
+        if ms >= SLOW_QUERY_MS:
+            self._statement = None
+            self._log(sql, parameters, rows, ms)
+
+    def fetchone(self):
+        start = time.perf_counter()
+        row = self._cursor.fetchone()
+        self._fetched(start)
+        return row
+
+    def fetchall(self):
+        start = time.perf_counter()
+        rows = self._cursor.fetchall()
+        self._fetched(start)
+        return rows
+
+    def __iter__(self):
+        return iter(self.fetchall())
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+    def _log(self, sql, parameters, executemany_rows, ms):
+        record = {
+            'ts': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'ms': round(ms, 3),
+            'sql': re.sub(r'\s+', ' ', sql).strip(),
+            'fingerprint': fingerprint(sql),
+            'parameters': parameter_shape(parameters),
+            'caller': calling_function(),
+            'plan': query_plan(self._cursor.connection, sql, parameters),
+        }
+        if executemany_rows is not None:
+            record['executemany_rows'] = executemany_rows
+        _get_logger().info(json.dumps(record, ensure_ascii=False))
+
+
+def read_log(path=None):
+    """Yield slow-query records from the log and its rotated backups, oldest first"""
+    path = Path(path or SLOW_LOG_PATH)
+    files = [path.with_name(f"{path.name}.{i}") for i in range(SLOW_LOG_BACKUPS, 0, -1)] + [path]
+    for file in files:
+        if not file.exists():
+            continue
+        with open(file, encoding="utf-8") as stream:
+            for line in stream:
+                if line.strip():
+                    yield json.loads(line)
+
+
+def summarize(records):
+    """Group records by fingerprint: count, total/p50/max ms, callers and latest plan"""
+    groups = {}
+    for record in records:
+        group = groups.setdefault(record['fingerprint'], {
+            'fingerprint': record['fingerprint'], 'count': 0, 'total_ms': 0.0, 'durations': [],
+            'callers': set(), 'plan': None,
+        })
+        group['count'] += 1
+        group['total_ms'] += record['ms']
+        group['durations'].append(record['ms'])
+        if record.get('caller'):
+            group['callers'].add(record['caller'].rsplit(':', 1)[0])
+        group['plan'] = record.get('plan') or group['plan']
+
+    summary = []
+    for group in groups.values():
+        durations = sorted(group.pop('durations'))
+        summary.append({
+            **group,
+            'p50_ms': durations[(len(durations) - 1) // 2],
+            'max_ms': durations[-1],
+            'callers': sorted(group['callers']),
+        })
+    summary.sort(key=lambda group: group['total_ms'], reverse=True)
+    return summary
+
+
+def main():
+    """Command line entry point: summarize the slow-query log"""
+    parser = argparse.ArgumentParser(description="Summarize the guitar tracker slow-query log")
+    parser.add_argument("--log", help=f"log file (default: {SLOW_LOG_PATH})")
+    parser.add_argument("--top", type=int, default=10, help="statements to show (default: %(default)s)")
+    parser.add_argument("--json", action="store_true", help="print the summary as JSON")
+    args = parser.parse_args()
+
+    summary = summarize(read_log(args.log))[:args.top]
+    if args.json:
+        json.dump(summary, sys.stdout, indent=2)
+        print()
+        return 0
+    if not summary:
+        print("No slow queries logged.")
+        return 0
+    for group in summary:
+        print(f"{group['count']:>6}x  total {group['total_ms']:.1f} ms  p50 {group['p50_ms']:.1f} ms  max {group['max_ms']:.1f} ms")
+        print(f"        {group['fingerprint']}")
+        if group['callers']:
+            print(f"        called from: {', '.join(group['callers'])}")
+        for line in group['plan'] or []:
+            print(f"        plan: {line}")
+        print()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
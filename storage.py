@@ -0,0 +1,947 @@
+"""
+Storage engines for the Classical Guitar Learning Tracker
+Goal, task and journal persistence behind one interface, on SQLite or in memory
+"""
+
+import abc
+import datetime
+import html
+import itertools
+import json
+import os
+import re
+import sqlite3
+import threading
+import unicodedata
+import uuid
+from collections import OrderedDict, namedtuple
+
+from db import MAX_OPEN_DATABASES, current_database, transaction
+from export_import import (BATCH_SIZE, import_records, iter_goal_records, record_journal_entries,
+                           record_practice_sessions)
+from migrations import ensure_schema, index_plain_text
+from text_codec import decode_text, encode_text
+
+# Which engine stores the data: "sqlite" (the database file) or "memory"
+# (nothing touches disk; everything is gone when the process exits)
+STORAGE_ENGINE = os.environ.get("GUITAR_TRACKER_STORAGE", "sqlite")
+
+# Number of goal cards shown per landing page
+GOALS_PAGE_SIZE = 20
+
+# Characters of each goal description shown on its landing card
+DESCRIPTION_PREVIEW_CHARS = 100
+
+# Maximum number of search matches fetched per query
+SEARCH_RESULT_LIMIT = 50
+
+# Every this many revisions of a journal entry a full snapshot is stored instead of a delta
+JOURNAL_SNAPSHOT_INTERVAL = 25
+
+# Earlier journal entries fetched per window on the goal page
+JOURNAL_WINDOW_SIZE = 7
+
+# Journal revisions listed per page of the goal page's history
+JOURNAL_REVISION_PAGE_SIZE = 50
+
+# Periods practice time is totalled over (see practice_periods())
+PRACTICE_PERIODS = ('day', 'week', 'month')
+
+# Everything the goal page shows for one goal, read as a single snapshot;
+# journal is the text of today's entry
+GoalBundle = namedtuple('GoalBundle', ['goal', 'tasks', 'journal'])
+
+
+def journal_date(day=None):
+    """Key of the journal entry for a day (default: today), as YYYY-MM-DD"""
+    return (day or datetime.date.today()).isoformat()
+
+
+def practice_periods(started_at):
+    """Start date of each rollup period containing a time or date, weeks starting on Monday"""
+    day = datetime.date.fromisoformat(str(started_at)[:10])
+    return {
+        'day': day.isoformat(),
+        'week': (day - datetime.timedelta(days=day.weekday())).isoformat(),
+        'month': day.replace(day=1).isoformat(),
+    }
+
+
+def journal_delta(old, new):
+    """Smallest single edit turning old into new: [start, end, replacement]"""
+    start = 0
+    limit = min(len(old), len(new))
+    while start < limit and old[start] == new[start]:
+        start += 1
+    end = 0
+    while end < limit - start and old[-end - 1] == new[-end - 1]:
+        end += 1
+    return [start, len(old) - end, new[start:len(new) - end]]
+
+
+def apply_journal_delta(text, delta):
+    """Apply a journal_delta() edit to text"""
+    start, end, replacement = delta
+    return text[:start] + replacement + text[end:]
+
+
+def build_search_query(text):
+    """Turn free text into an FTS5 query where every word matches as a prefix"""
+    return ' '.join(f'"{word}"*' for word in re.findall(r'\w+', text))
+
+
+def best_match_per_goal(matches):
+    """Keep the best match of each goal and render its snippet as HTML.
+
+    matches are (goal_id, name, kind, snippet) rows, best first, with the
+    matched words of the snippet between \\x02 and \\x03.
+    """
+    results, seen = [], set()
+    for goal_id, name, kind, snippet in matches:
+        if goal_id in seen:
+            continue
+        seen.add(goal_id)
+        snippet_html = html.escape(snippet or "").replace('\x02', '<mark>').replace('\x03', '</mark>')
+        results.append((goal_id, name, kind, snippet_html))
+    return results
+
+
+class Storage(abc.ABC):
+    """Goal, task and journal persistence used by the app.
+
+    Goal rows are tuples in the column order of the goals table: (id,
+    month, year, name, description, completion_criteria, header_text,
+    created_at, updated_at, external_id). Task rows are (id, goal_id,
+    task_description, task_order, created_at). A journal is a set of
+    entries, one per day, keyed by journal_date(); only today's entry is
+    edited. Practice sessions are only ever added, and read back as
+    per-period totals. Engines must be safe to call from several threads
+    at once.
+    """
+
+    @abc.abstractmethod
+    def data_version(self):
+        """Number that changes whenever the data is written, by anyone"""
+
+    @abc.abstractmethod
+    def others_data_version(self):
+        """Number that changes whenever the data is written by anything but this thread's own writes"""
+
+    @abc.abstractmethod
+    def get_current_goal(self):
+        """Get or create the goal for the current month/year"""
+
+    @abc.abstractmethod
+    def get_all_goals(self):
+        """All goal rows, newest month first"""
+
+    @abc.abstractmethod
+    def get_goal_summaries(self, after=None, limit=GOALS_PAGE_SIZE):
+        """One page of (id, name, description_preview, created_at, year, month), newest first.
+
+        The preview is one character longer than DESCRIPTION_PREVIEW_CHARS
+        when the description was truncated. after is the (year, month, id)
+        key of the last row of the previous page.
+        """
+
+    @abc.abstractmethod
+    def load_goal_bundle(self, goal_id, entry_date=None):
+        """GoalBundle of a goal, its ordered tasks (a tuple) and its journal entry of entry_date (default today)"""
+
+    @abc.abstractmethod
+    def get_journal_entries(self, goal_id, before, limit=JOURNAL_WINDOW_SIZE):
+        """One window of non-empty (entry_date, content) journal entries dated before before, newest first"""
+
+    @abc.abstractmethod
+    def create_goal(self):
+        """Create an empty goal for the current month; returns its row"""
+
+    @abc.abstractmethod
+    def delete_goals(self, goal_ids):
+        """Delete goals together with their tasks, journal and journal history"""
+
+    @abc.abstractmethod
+    def save_goal(self, goal_id, name, description, completion_criteria, header_text=None):
+        """Update a goal's text fields (header_text only when given)"""
+
+    @abc.abstractmethod
+    def save_tasks(self, goal_id, tasks):
+        """Store task texts by slot position, skipping empty slots; returns whether anything changed"""
+
+    @abc.abstractmethod
+    def save_journal_content(self, goal_id, content, entry_date):
+        """Replace the text of the journal entry of entry_date, adding a revision; returns False if it was unchanged"""
+
+    @abc.abstractmethod
+    def get_journal_revisions(self, goal_id, limit=JOURNAL_REVISION_PAGE_SIZE):
+        """The latest limit (revision, entry_date, kind, stored size in bytes, created_at) rows, newest first.
+
+        The size is that of the stored, possibly compressed, payload.
+        """
+
+    @abc.abstractmethod
+    def get_journal_revision(self, goal_id, revision):
+        """Text of the revised journal entry as it was at a revision, or None if there is no such revision"""
+
+    @abc.abstractmethod
+    def log_practice_session(self, goal_id, started_at, minutes, task_id=None, tempo=None, notes=""):
+        """Record a practice session and add it to the goal's rollups; returns its id.
+
+        started_at is a local 'YYYY-MM-DD HH:MM:SS' time, task_id the id of
+        one of the goal's tasks (or None) and tempo a metronome marking. A
+        task_id that is no longer one of the goal's tasks is logged as None.
+        Returns None, logging nothing, when the goal does not exist.
+        """
+
+    @abc.abstractmethod
+    def get_practice_rollups(self, goal_id, period, since):
+        """(period_start, sessions, minutes) of one of PRACTICE_PERIODS from since on, newest first.
+
+        Periods without practice have no row.
+        """
+
+    @abc.abstractmethod
+    def search_goals(self, text, limit=SEARCH_RESULT_LIMIT):
+        """Best match per goal as (goal_id, name, kind, snippet_html), best goals first"""
+
+    @abc.abstractmethod
+    def iter_goal_records(self):
+        """Yield every goal as an export record (see export_import)"""
+
+    @abc.abstractmethod
+    def import_records(self, records, progress=None):
+        """Upsert export records by external_id; returns the number imported"""
+
+    def close(self):
+        """Release what the engine keeps open; using the engine again reopens it"""
+
+
+def _decoded_goal(goal):
+    """Goal row with its description decompressed"""
+    if goal is None or not isinstance(goal[4], bytes):
+        return goal
+    return goal[:4] + (decode_text(goal[4]),) + goal[5:]
+
+
+class SQLiteStorage(Storage):
+    """Storage in the SQLite database file, through the pooled connections of db.py"""
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        # Separate connection whose data_version moves whenever any other connection commits
+        self._watcher = None
+        self._watcher_lock = threading.Lock()
+
+    def data_version(self):
+        with self._watcher_lock:
+            if self._watcher is None:
+                self._watcher = sqlite3.connect(self.db_path, check_same_thread=False)
+            return self._watcher.execute("PRAGMA data_version").fetchone()[0]
+
+    def others_data_version(self):
+        # A connection's data_version ignores its own commits, and this thread writes through this one
+        with transaction() as cursor:
+            cursor.execute("PRAGMA data_version")
+            return cursor.fetchone()[0]
+
+    def close(self):
+        with self._watcher_lock:
+            if self._watcher is not None:
+                self._watcher.close()
+                self._watcher = None
+
+    def get_current_goal(self):
+        now = datetime.datetime.now()
+        month, year = now.month, now.year
+
+        with transaction(write=True) as cursor:
+            cursor.execute('SELECT * FROM goals WHERE month = ? AND year = ?', (month, year))
+            goal = cursor.fetchone()
+
+            if not goal:
+                # Create new goal for this month
+                cursor.execute('''
+                    INSERT INTO goals (month, year, name, description, completion_criteria, header_text)
+                    VALUES (?, ?, "", "", "", "")
+                ''', (month, year))
+                cursor.execute('SELECT * FROM goals WHERE id = ?', (cursor.lastrowid,))
+                goal = cursor.fetchone()
+
+        return _decoded_goal(goal)
+
+    def get_all_goals(self):
+        with transaction() as cursor:
+            cursor.execute('SELECT * FROM goals ORDER BY year DESC, month DESC')
+            return [_decoded_goal(goal) for goal in cursor.fetchall()]
+
+    def get_goal_summaries(self, after=None, limit=GOALS_PAGE_SIZE):
+        with transaction() as cursor:
+            if after is None:
+                cursor.execute('''
+                    SELECT id, name, substr(decode_text(description), 1, ?), created_at, year, month
+                    FROM goals
+                    ORDER BY year DESC, month DESC, id DESC
+                    LIMIT ?
+                ''', (DESCRIPTION_PREVIEW_CHARS + 1, limit))
+            else:
+                cursor.execute('''
+                    SELECT id, name, substr(decode_text(description), 1, ?), created_at, year, month
+                    FROM goals
+                    WHERE (year, month, id) < (?, ?, ?)
+                    ORDER BY year DESC, month DESC, id DESC
+                    LIMIT ?
+                ''', (DESCRIPTION_PREVIEW_CHARS + 1, *after, limit))
+            return cursor.fetchall()
+
+    def load_goal_bundle(self, goal_id, entry_date=None):
+        # One read transaction, so goal, tasks and journal are a consistent snapshot
+        with transaction() as cursor:
+            cursor.execute('SELECT * FROM goals WHERE id = ?', (goal_id,))
+            goal = cursor.fetchone()
+            if not goal:
+                return None
+
+            cursor.execute('SELECT * FROM tasks WHERE goal_id = ? ORDER BY task_order', (goal_id,))
+            tasks = tuple(cursor.fetchall())
+
+            cursor.execute('SELECT content FROM journal_entries WHERE goal_id = ? AND entry_date = ?',
+                           (goal_id, entry_date or journal_date()))
+            journal = cursor.fetchone()
+
+        return GoalBundle(_decoded_goal(goal), tasks, decode_text(journal[0]) if journal else "")
+
+    def get_journal_entries(self, goal_id, before, limit=JOURNAL_WINDOW_SIZE):
+        with transaction() as cursor:
+            cursor.execute('''
+                SELECT entry_date, content FROM journal_entries
+                WHERE goal_id = ? AND entry_date < ? AND content != ''
+                ORDER BY entry_date DESC
+                LIMIT ?
+            ''', (goal_id, before, limit))
+            return [(entry_date, decode_text(content)) for entry_date, content in cursor.fetchall()]
+
+    def create_goal(self):
+        now = datetime.datetime.now()
+        month, year = now.month, now.year
+
+        with transaction(write=True) as cursor:
+            # Create new goal - always creates a new one regardless of month
+            cursor.execute('''
+                INSERT INTO goals (month, year, name, description, completion_criteria, header_text)
+                VALUES (?, ?, "", "", "", "")
+            ''', (month, year))
+            goal_id = cursor.lastrowid
+
+            # Fetch the newly created goal
+            cursor.execute('SELECT * FROM goals WHERE id = ?', (goal_id,))
+            return _decoded_goal(cursor.fetchone())
+
+    def delete_goals(self, goal_ids):
+        with transaction(write=True) as cursor:
+            # Tasks, journal entries and journal history go with ON DELETE CASCADE
+            cursor.executemany('DELETE FROM goals WHERE id = ?', [(goal_id,) for goal_id in goal_ids])
+
+    def save_goal(self, goal_id, name, description, completion_criteria, header_text=None):
+        stored = encode_text(description)
+        with transaction(write=True) as cursor:
+            if header_text is not None:
+                cursor.execute('''
+                    UPDATE goals
+                    SET name = ?, description = ?, completion_criteria = ?, header_text = ?, updated_at = CURRENT_TIMESTAMP
+                    WHERE id = ?
+                ''', (name, stored, completion_criteria, header_text, goal_id))
+            else:
+                cursor.execute('''
+                    UPDATE goals
+                    SET name = ?, description = ?, completion_criteria = ?, updated_at = CURRENT_TIMESTAMP
+                    WHERE id = ?
+                ''', (name, stored, completion_criteria, goal_id))
+            if stored is not description:
+                index_plain_text(cursor, 'goal', goal_id, description)
+
+    def save_tasks(self, goal_id, tasks):
+        # Only save non-empty tasks
+        wanted = {i: task.strip() for i, task in enumerate(tasks) if task.strip()}
+
+        with transaction(write=True) as cursor:
+            cursor.execute('SELECT id, task_order, task_description FROM tasks WHERE goal_id = ?', (goal_id,))
+
+            # Diff against the stored rows so unchanged tasks keep their row ids
+            updates, deletes, stored = [], [], set()
+            for task_id, order, description in cursor.fetchall():
+                if order not in wanted or order in stored:
+                    # Slot was cleared (or holds a duplicate row)
+                    deletes.append((task_id,))
+                elif wanted[order] != description:
+                    updates.append((wanted[order], task_id))
+                stored.add(order)
+            inserts = [(goal_id, description, order) for order, description in wanted.items() if order not in stored]
+
+            if deletes:
+                cursor.executemany('DELETE FROM tasks WHERE id = ?', deletes)
+            if updates:
+                cursor.executemany('UPDATE tasks SET task_description = ? WHERE id = ?', updates)
+            if inserts:
+                cursor.executemany('''
+                    INSERT INTO tasks (goal_id, task_description, task_order)
+                    VALUES (?, ?, ?)
+                ''', inserts)
+
+        return bool(deletes or updates or inserts)
+
+    def _append_journal_revision(self, cursor, goal_id, entry_date, previous, content):
+        """Record content as the next revision of a journal entry, as a delta against previous"""
+        cursor.execute('SELECT MAX(revision) FROM journal_revisions WHERE goal_id = ?', (goal_id,))
+        last_revision = cursor.fetchone()[0] or 0
+        cursor.execute('SELECT COUNT(*) FROM journal_revisions WHERE goal_id = ? AND entry_date = ?',
+                       (goal_id, entry_date))
+        entry_revisions = cursor.fetchone()[0]
+
+        rows = []
+        if entry_revisions == 0 and previous:
+            # Entry written before history was kept - its text becomes its first revision
+            last_revision += 1
+            entry_revisions = 1
+            rows.append((goal_id, entry_date, last_revision, 'snapshot', encode_text(previous)))
+
+        # Every entry's history starts with a snapshot, so replay never crosses entries
+        if entry_revisions % JOURNAL_SNAPSHOT_INTERVAL == 0:
+            rows.append((goal_id, entry_date, last_revision + 1, 'snapshot', encode_text(content)))
+        else:
+            rows.append((goal_id, entry_date, last_revision + 1, 'delta',
+                         encode_text(json.dumps(journal_delta(previous, content)))))
+
+        cursor.executemany('''
+            INSERT INTO journal_revisions (goal_id, entry_date, revision, kind, payload)
+            VALUES (?, ?, ?, ?, ?)
+        ''', rows)
+
+    def save_journal_content(self, goal_id, content, entry_date):
+        with transaction(write=True) as cursor:
+            # Check if today's journal entry exists
+            cursor.execute('SELECT id, content FROM journal_entries WHERE goal_id = ? AND entry_date = ?',
+                           (goal_id, entry_date))
+            existing = cursor.fetchone()
+            previous = decode_text(existing[1] or "") if existing else ""
+
+            if previous == content:
+                return False
+
+            # The entry row keeps the latest text; history only grows by the edit
+            self._append_journal_revision(cursor, goal_id, entry_date, previous, content)
+            stored = encode_text(content)
+
+            if existing:
+                cursor.execute('''
+                    UPDATE journal_entries
+                    SET content = ?, updated_at = CURRENT_TIMESTAMP
+                    WHERE id = ?
+                ''', (stored, existing[0]))
+                entry_id = existing[0]
+            else:
+                cursor.execute('''
+                    INSERT INTO journal_entries (goal_id, entry_date, content)
+                    VALUES (?, ?, ?)
+                ''', (goal_id, entry_date, stored))
+                entry_id = cursor.lastrowid
+            if stored is not content:
+                index_plain_text(cursor, 'journal', entry_id, content)
+        return True
+
+    def get_journal_revisions(self, goal_id, limit=JOURNAL_REVISION_PAGE_SIZE):
+        with transaction() as cursor:
+            cursor.execute('''
+                SELECT revision, entry_date, kind, length(CAST(payload AS BLOB)), created_at
+                FROM journal_revisions
+                WHERE goal_id = ?
+                ORDER BY revision DESC
+                LIMIT ?
+            ''', (goal_id, limit))
+            return cursor.fetchall()
+
+    def get_journal_revision(self, goal_id, revision):
+        with transaction() as cursor:
+            cursor.execute('SELECT entry_date FROM journal_revisions WHERE goal_id = ? AND revision = ?',
+                           (goal_id, revision))
+            entry = cursor.fetchone()
+            if entry is None:
+                return None
+
+            # Start from the entry's nearest snapshot and replay the deltas after it
+            cursor.execute('''
+                SELECT MAX(revision) FROM journal_revisions
+                WHERE goal_id = ? AND entry_date = ? AND revision <= ? AND kind = 'snapshot'
+            ''', (goal_id, entry[0], revision))
+            snapshot = cursor.fetchone()[0]
+            if snapshot is None:
+                return None
+
+            cursor.execute('''
+                SELECT kind, payload FROM journal_revisions
+                WHERE goal_id = ? AND entry_date = ? AND revision BETWEEN ? AND ?
+                ORDER BY revision
+            ''', (goal_id, entry[0], snapshot, revision))
+            text = ""
+            for kind, payload in cursor.fetchall():
+                payload = decode_text(payload)
+                text = payload if kind == 'snapshot' else apply_journal_delta(text, json.loads(payload))
+        return text
+
+    def log_practice_session(self, goal_id, started_at, minutes, task_id=None, tempo=None, notes=""):
+        with transaction(write=True) as cursor:
+            # The practice_rollups triggers fold the session into its day, week and month in the same write.
+            # Selecting from goals and tasks drops a goal or task deleted since the form was shown.
+            cursor.execute('''
+                INSERT INTO practice_sessions (goal_id, task_id, started_at, duration_minutes, tempo, notes)
+                SELECT id, (SELECT id FROM tasks WHERE id = ? AND goal_id = goals.id), ?, ?, ?, ?
+                FROM goals WHERE id = ?
+            ''', (task_id, started_at, minutes, tempo, notes, goal_id))
+            return cursor.lastrowid if cursor.rowcount else None
+
+    def get_practice_rollups(self, goal_id, period, since):
+        with transaction() as cursor:
+            cursor.execute('''
+                SELECT period_start, sessions, minutes FROM practice_rollups
+                WHERE goal_id = ? AND period = ? AND period_start >= ?
+                ORDER BY period_start DESC
+            ''', (goal_id, period, since))
+            return cursor.fetchall()
+
+    def search_goals(self, text, limit=SEARCH_RESULT_LIMIT):
+        query = build_search_query(text)
+        if not query:
+            return []
+
+        try:
+            with transaction() as cursor:
+                cursor.execute('''
+                    SELECT search_index.goal_id, goals.name, search_index.kind,
+                           snippet(search_index, -1, char(2), char(3), '…', 12)
+                    FROM search_index JOIN goals ON goals.id = search_index.goal_id
+                    WHERE search_index MATCH ?
+                    ORDER BY rank
+                    LIMIT ?
+                ''', (query, limit))
+                matches = cursor.fetchall()
+        except sqlite3.OperationalError as e:
+            # No search index (SQLite without FTS5)
+            print(f"Error searching goals: {e}")
+            return []
+        return best_match_per_goal(matches)
+
+    def iter_goal_records(self):
+        return iter_goal_records()
+
+    def import_records(self, records, progress=None):
+        return import_records(records, progress=progress)
+
+
+def _timestamp():
+    """Current UTC time formatted like SQLite's CURRENT_TIMESTAMP"""
+    return datetime.datetime.now(datetime.timezone.utc).strftime('%Y-%m-%d %H:%M:%S')
+
+
+def _fold(text):
+    """Lower-case text with accents removed, as the search tokenizer sees it"""
+    decomposed = unicodedata.normalize('NFKD', text.lower())
+    return ''.join(char for char in decomposed if not unicodedata.combining(char))
+
+
+class MemoryStorage(Storage):
+    """Storage in plain Python structures, for load tests, benchmarks and demos.
+
+    Goals are a dict of mutable rows keyed by id. Each goal's tasks are a
+    list indexed by slot (None where a slot is empty), its journal a dict
+    of entries keyed by date, and its journal history a list whose index
+    is the revision number minus one, so the same delta/snapshot layout
+    as on disk applies. One lock guards
+    everything; no operation does I/O, so it is only ever held briefly.
+    """
+
+    # Search weight of a goal's name relative to the body text (bm25 weights on disk)
+    TITLE_WEIGHT = 5.0
+
+    # Words around the first match shown in a search snippet
+    SNIPPET_WORDS = 12
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._ids = itertools.count(1)
+        self._task_ids = itertools.count(1)
+        # goal id -> [id, month, year, name, description, completion_criteria,
+        #             header_text, created_at, updated_at, external_id]
+        self._goals = {}
+        # external id -> goal id
+        self._external_ids = {}
+        # goal id -> [task row or None per slot]
+        self._tasks = {}
+        # goal id -> {entry_date: [content, updated_at]}
+        self._journals = {}
+        # goal id -> [(entry_date, kind, payload (encode_text() values, as on disk), created_at)], revision n at index n - 1
+        self._revisions = {}
+        self._session_ids = itertools.count(1)
+        # goal id -> [[id, goal_id, task_id, started_at, duration_minutes, tempo, notes, created_at]]
+        self._sessions = {}
+        # goal id -> {(period, period_start): [sessions, minutes]}
+        self._rollups = {}
+        # Bumped by every write, standing in for SQLite's data_version
+        self._writes = 0
+
+    def data_version(self):
+        return self._writes
+
+    def others_data_version(self):
+        # Only the app writes here, and its writes invalidate the read cache themselves
+        return 0
+
+    def _insert_goal(self, month, year, external_id=None):
+        goal_id = next(self._ids)
+        now = _timestamp()
+        external_id = external_id or uuid.uuid4().hex
+        self._goals[goal_id] = [goal_id, month, year, "", "", "", "", now, now, external_id]
+        self._external_ids[external_id] = goal_id
+        self._tasks[goal_id] = []
+        self._journals[goal_id] = {}
+        self._revisions[goal_id] = []
+        self._sessions[goal_id] = []
+        self._rollups[goal_id] = {}
+        self._writes += 1
+        return goal_id
+
+    def get_current_goal(self):
+        now = datetime.datetime.now()
+        with self._lock:
+            for goal in self._goals.values():
+                if goal[1] == now.month and goal[2] == now.year:
+                    return tuple(goal)
+            return tuple(self._goals[self._insert_goal(now.month, now.year)])
+
+    def _ordered_goals(self):
+        """Goal rows newest first, in the landing page's (year, month, id) order"""
+        return sorted(self._goals.values(), key=lambda goal: (goal[2], goal[1], goal[0]), reverse=True)
+
+    def get_all_goals(self):
+        with self._lock:
+            return [tuple(goal) for goal in self._ordered_goals()]
+
+    def get_goal_summaries(self, after=None, limit=GOALS_PAGE_SIZE):
+        with self._lock:
+            rows = []
+            for goal in self._ordered_goals():
+                if after is not None and (goal[2], goal[1], goal[0]) >= tuple(after):
+                    continue
+                rows.append((goal[0], goal[3], (goal[4] or "")[:DESCRIPTION_PREVIEW_CHARS + 1], goal[7], goal[2], goal[1]))
+                if len(rows) == limit:
+                    break
+            return rows
+
+    def load_goal_bundle(self, goal_id, entry_date=None):
+        with self._lock:
+            goal = self._goals.get(goal_id)
+            if goal is None:
+                return None
+            tasks = tuple(task for task in self._tasks[goal_id] if task is not None)
+            journal = self._journals[goal_id].get(entry_date or journal_date())
+            return GoalBundle(tuple(goal), tasks, journal[0] if journal else "")
+
+    def get_journal_entries(self, goal_id, before, limit=JOURNAL_WINDOW_SIZE):
+        with self._lock:
+            entries = self._journals.get(goal_id, {})
+            dates = sorted((day for day in entries if day < before and entries[day][0]), reverse=True)[:limit]
+            return [(day, entries[day][0]) for day in dates]
+
+    def create_goal(self):
+        now = datetime.datetime.now()
+        with self._lock:
+            goal_id = self._insert_goal(now.month, now.year)
+            return tuple(self._goals[goal_id])
+
+    def delete_goals(self, goal_ids):
+        with self._lock:
+            for goal_id in goal_ids:
+                goal = self._goals.pop(goal_id, None)
+                if goal is None:
+                    continue
+                del self._external_ids[goal[9]]
+                for table in (self._tasks, self._journals, self._revisions, self._sessions, self._rollups):
+                    table.pop(goal_id, None)
+                self._writes += 1
+
+    def save_goal(self, goal_id, name, description, completion_criteria, header_text=None):
+        with self._lock:
+            goal = self._goals.get(goal_id)
+            if goal is None:
+                return
+            goal[3:6] = [name, description, completion_criteria]
+            if header_text is not None:
+                goal[6] = header_text
+            goal[8] = _timestamp()
+            self._writes += 1
+
+    def save_tasks(self, goal_id, tasks):
+        with self._lock:
+            slots = self._tasks.get(goal_id)
+            if slots is None:
+                return False
+            changed = False
+            size = max(len(slots), len(tasks))
+            slots.extend([None] * (size - len(slots)))
+            for order in range(size):
+                text = tasks[order].strip() if order < len(tasks) else ""
+                task = slots[order]
+                if not text:
+                    if task is not None:
+                        self._unlink_sessions(goal_id, {task[0]})
+                        changed = True
+                    slots[order] = None
+                elif task is None:
+                    slots[order] = (next(self._task_ids), goal_id, text, order, _timestamp())
+                    changed = True
+                elif task[2] != text:
+                    slots[order] = task[:2] + (text,) + task[3:]
+                    changed = True
+            # Trailing empty slots are dropped so the list never outgrows the form
+            while slots and slots[-1] is None:
+                slots.pop()
+            self._writes += changed
+            return changed
+
+    def _unlink_sessions(self, goal_id, task_ids):
+        """Detach practice sessions from deleted tasks, as ON DELETE SET NULL does on disk"""
+        for session in self._sessions[goal_id]:
+            if session[2] in task_ids:
+                session[2] = None
+
+    def save_journal_content(self, goal_id, content, entry_date):
+        with self._lock:
+            if goal_id not in self._goals:
+                return False
+            journal = self._journals[goal_id].get(entry_date)
+            previous = journal[0] if journal else ""
+            if previous == content:
+                return False
+
+            revisions = self._revisions[goal_id]
+            entry_revisions = sum(1 for revision in revisions if revision[0] == entry_date)
+            now = _timestamp()
+            if not entry_revisions and previous:
+                # Same rule as on disk: text from before the history becomes the entry's first revision
+                revisions.append((entry_date, 'snapshot', encode_text(previous), now))
+                entry_revisions = 1
+            if entry_revisions % JOURNAL_SNAPSHOT_INTERVAL == 0:
+                revisions.append((entry_date, 'snapshot', encode_text(content), now))
+            else:
+                revisions.append((entry_date, 'delta', encode_text(json.dumps(journal_delta(previous, content))), now))
+            self._journals[goal_id][entry_date] = [content, now]
+            self._writes += 1
+            return True
+
+    def get_journal_revisions(self, goal_id, limit=JOURNAL_REVISION_PAGE_SIZE):
+        with self._lock:
+            revisions = self._revisions.get(goal_id, [])
+            first = max(len(revisions) - limit, 0)
+            return [(number, entry_date, kind, len(payload if isinstance(payload, bytes) else payload.encode('utf-8')),
+                     created_at)
+                    for number, (entry_date, kind, payload, created_at)
+                    in reversed(list(enumerate(revisions[first:], first + 1)))]
+
+    def get_journal_revision(self, goal_id, revision):
+        with self._lock:
+            revisions = self._revisions.get(goal_id, [])[:revision]
+        if revision < 1 or len(revisions) < revision:
+            return None
+        # Start from the entry's nearest snapshot and replay its deltas after it
+        entry_date = revisions[-1][0]
+        entry_revisions = [revision for revision in revisions if revision[0] == entry_date]
+        start = max(i for i, (_, kind, _, _) in enumerate(entry_revisions) if kind == 'snapshot')
+        text = ""
+        for _, kind, payload, _ in entry_revisions[start:]:
+            payload = decode_text(payload)
+            text = payload if kind == 'snapshot' else apply_journal_delta(text, json.loads(payload))
+        return text
+
+    def _add_session(self, goal_id, started_at, minutes, task_id, tempo, notes):
+        """Append a practice session and count it into the goal's rollups"""
+        session_id = next(self._session_ids)
+        self._sessions[goal_id].append([session_id, goal_id, task_id, started_at, minutes, tempo, notes, _timestamp()])
+        rollups = self._rollups[goal_id]
+        for key in practice_periods(started_at).items():
+            totals = rollups.setdefault(key, [0, 0])
+            totals[0] += 1
+            totals[1] += minutes
+        return session_id
+
+    def log_practice_session(self, goal_id, started_at, minutes, task_id=None, tempo=None, notes=""):
+        with self._lock:
+            if goal_id not in self._goals:
+                return None
+            if not any(task and task[0] == task_id for task in self._tasks[goal_id]):
+                task_id = None
+            session_id = self._add_session(goal_id, started_at, minutes, task_id, tempo, notes)
+            self._writes += 1
+            return session_id
+
+    def get_practice_rollups(self, goal_id, period, since):
+        with self._lock:
+            rows = [(start, *totals) for (key_period, start), totals in self._rollups.get(goal_id, {}).items()
+                    if key_period == period and start >= since]
+        return sorted(rows, reverse=True)
+
+    @staticmethod
+    def _tokens(text):
+        """Words of text as (match, folded word) pairs"""
+        return [(word, _fold(word.group())) for word in re.finditer(r'\w+', text or "")]
+
+    def _snippet(self, text, tokens, hits):
+        """Window of words around the first hit, hit words between \x02 and \x03"""
+        words = [word for word, _ in tokens]
+        first = max(0, min(hits[0] - self.SNIPPET_WORDS // 4, len(words) - self.SNIPPET_WORDS))
+        window = range(first, min(first + self.SNIPPET_WORDS, len(words)))
+        parts, position = [], words[first].start()
+        for i in window:
+            parts.append(text[position:words[i].start()])
+            parts.append(f'\x02{words[i].group()}\x03' if i in hits else words[i].group())
+            position = words[i].end()
+        return ('…' if first else '') + ''.join(parts) + ('…' if window.stop < len(words) else '')
+
+    def search_goals(self, text, limit=SEARCH_RESULT_LIMIT):
+        terms = [_fold(word) for word in re.findall(r'\w+', text)]
+        if not terms:
+            return []
+
+        with self._lock:
+            documents = []
+            for goal_id, goal in self._goals.items():
+                documents.append((goal_id, 'goal', goal[3], goal[4]))
+                documents.extend((goal_id, 'task', "", task[2]) for task in self._tasks[goal_id] if task)
+                documents.extend((goal_id, 'journal', "", entry[0]) for entry in self._journals[goal_id].values())
+            names = {goal_id: goal[3] for goal_id, goal in self._goals.items()}
+
+        matches = []
+        for goal_id, kind, title, body in documents:
+            title_tokens, body_tokens = self._tokens(title), self._tokens(body)
+            # Like FTS5, a document matches when every term prefixes one of its words
+            folded = {word for _, word in title_tokens + body_tokens}
+            if not all(any(word.startswith(term) for word in folded) for term in terms):
+                continue
+
+            title_hits = [i for i, (_, word) in enumerate(title_tokens) if word.startswith(tuple(terms))]
+            body_hits = [i for i, (_, word) in enumerate(body_tokens) if word.startswith(tuple(terms))]
+            score = self.TITLE_WEIGHT * len(title_hits) + len(body_hits)
+            if title_hits:
+                snippet = self._snippet(title, title_tokens, title_hits)
+            else:
+                snippet = self._snippet(body, body_tokens, body_hits)
+            matches.append((score, goal_id, names[goal_id], kind, snippet))
+
+        matches.sort(key=lambda match: (-match[0], -match[1]))
+        return best_match_per_goal(match[1:] for match in matches[:limit])
+
+    def iter_goal_records(self):
+        with self._lock:
+            records = []
+            for goal_id in sorted(self._goals):
+                goal = self._goals[goal_id]
+                journal = self._journals[goal_id]
+                task_orders = {task[0]: task[3] for task in self._tasks[goal_id] if task}
+                sessions = sorted(self._sessions[goal_id], key=lambda session: (session[3], session[0]))
+                records.append({
+                    'external_id': goal[9], 'month': goal[1], 'year': goal[2], 'name': goal[3],
+                    'description': goal[4], 'completion_criteria': goal[5], 'header_text': goal[6],
+                    'created_at': goal[7], 'updated_at': goal[8],
+                    'tasks': [{'order': task[3], 'description': task[2]} for task in self._tasks[goal_id] if task],
+                    'journal_entries': [{'date': day, 'text': journal[day][0]} for day in sorted(journal)],
+                    'practice_sessions': [{'started_at': session[3], 'minutes': session[4],
+                                           'task_order': task_orders.get(session[2]), 'tempo': session[5],
+                                           'notes': session[6]} for session in sessions],
+                })
+        yield from records
+
+    def import_records(self, records, progress=None):
+        total = 0
+        for record in records:
+            with self._lock:
+                external_id = record.get('external_id') or uuid.uuid4().hex
+                goal_id = self._external_ids.get(external_id)
+                if goal_id is None:
+                    goal_id = self._insert_goal(record.get('month'), record.get('year'), external_id)
+                goal = self._goals[goal_id]
+                goal[1:9] = [record.get(field) for field in ('month', 'year', 'name', 'description',
+                                                             'completion_criteria', 'header_text',
+                                                             'created_at', 'updated_at')]
+                # Imported goals replace their tasks, journal and practice sessions, as on disk
+                sessions = record_practice_sessions(record)
+                if sessions is not None:
+                    self._sessions[goal_id], self._rollups[goal_id] = [], {}
+                slots = []
+                for task in record.get('tasks', []):
+                    slots.extend([None] * (task['order'] + 1 - len(slots)))
+                    slots[task['order']] = (next(self._task_ids), goal_id, task['description'], task['order'], _timestamp())
+                self._unlink_sessions(goal_id, {task[0] for task in self._tasks[goal_id] if task})
+                self._tasks[goal_id] = slots
+                journal = {entry['date']: [entry['text'], _timestamp()] for entry in record_journal_entries(record)}
+                # Entries with a history get their imported text as a snapshot, as on disk
+                revisions = self._revisions[goal_id]
+                for day in sorted({revision[0] for revision in revisions}):
+                    text = journal.get(day, [""])[0]
+                    if text != self._journals[goal_id].get(day, [""])[0]:
+                        revisions.append((day, 'snapshot', encode_text(text), _timestamp()))
+                self._journals[goal_id] = journal
+                task_ids = {task[3]: task[0] for task in slots if task}
+                for session in sessions or []:
+                    self._add_session(goal_id, session['started_at'], session['minutes'],
+                                      task_ids.get(session['task_order']), session['tempo'], session['notes'])
+                self._writes += 1
+            total += 1
+            if progress and total % BATCH_SIZE == 0:
+                progress(total)
+        if progress and total % BATCH_SIZE:
+            progress(total)
+        return total
+
+
+# database path -> Storage, least recently used first
+_storages = OrderedDict()
+_storages_lock = threading.Lock()
+
+
+def get_storage():
+    """Storage for the current database, using the configured engine.
+
+    The SQLite engine brings the database schema up to date when it is
+    first opened, and only MAX_OPEN_DATABASES of them are kept open. The
+    memory engine keeps one store per database path for the life of the
+    process, so per-student data stays apart just as it does on disk.
+
+    Engines are opened, and their schema upgraded, outside the lock on the
+    open engines and published afterwards, so a slow migration of one
+    database does not hold up the first use of any other.
+    """
+    db_path = current_database()
+    with _storages_lock:
+        storage = _storages.get(db_path)
+        if storage is not None:
+            _storages.move_to_end(db_path)
+            return storage
+
+    if STORAGE_ENGINE == "memory":
+        storage = MemoryStorage()
+    elif STORAGE_ENGINE == "sqlite":
+        ensure_schema()
+        storage = SQLiteStorage(db_path)
+    else:
+        raise ValueError(f"Unknown storage engine {STORAGE_ENGINE!r} (use 'sqlite' or 'memory')")
+
+    with _storages_lock:
+        # Another session may have opened the same database meanwhile; the first one published is kept
+        published = _storages.get(db_path)
+        if published is not None:
+            _storages.move_to_end(db_path)
+            return published
+        _storages[db_path] = storage
+
+        # A read cache still holding a dropped engine reopens its connection on next use
+        stale = [path for path, other in _storages.items() if isinstance(other, SQLiteStorage)]
+        for path in stale[:len(stale) - MAX_OPEN_DATABASES]:
+            _storages.pop(path).close()
+    return storage
@@ -0,0 +1,54 @@
+"""
+Per-student databases for multi-student deployments
+Maps the user identity of a request to its own SQLite shard
+"""
+
+import hashlib
+import os
+import re
+from pathlib import Path
+
+from db import DB_PATH
+
+# How a student is identified: "off" (one shared database), "query"
+# (?user=name in the URL) or "header" (set by a local reverse proxy)
+TENANCY_MODE = os.environ.get("GUITAR_TRACKER_TENANCY", "off")
+
+USER_QUERY_PARAM = "user"
+USER_HEADER = os.environ.get("GUITAR_TRACKER_USER_HEADER", "X-Forwarded-User")
+
+# Where per-student databases live
+SHARD_DIR = Path.home() / "guitar_tracker_shards"
+
+
+def tenancy_enabled():
+    return TENANCY_MODE in ("query", "header")
+
+
+def resolve_user(query_params, headers):
+    """User identity for a request, or None when there is none (or tenancy is off)"""
+    if TENANCY_MODE == "query":
+        user = query_params.get(USER_QUERY_PARAM)
+    elif TENANCY_MODE == "header":
+        user = headers.get(USER_HEADER)
+    else:
+        return None
+    return user.strip() if user and user.strip() else None
+
+
+def shard_path(user):
+    """Database file for a user: a readable slug plus a hash so names never collide"""
+    slug = re.sub(r'[^A-Za-z0-9_-]+', '_', user)[:40] or "user"
+    digest = hashlib.sha1(user.encode("utf-8")).hexdigest()[:10]
+    return SHARD_DIR / f"{slug}-{digest}.db"
+
+
+def database_for(user):
+    """Database to use for a user; the shared DB_PATH when there is no user.
+
+    The shard file itself is created by SQLite on first connect.
+    """
+    if user is None:
+        return DB_PATH
+    SHARD_DIR.mkdir(parents=True, exist_ok=True)
+    return shard_path(user)
@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""
+Text compression codec for the Classical Guitar Learning Tracker
+Stores long journal entries, journal snapshots and goal descriptions zlib-compressed, and reports the space saved
+"""
+
+import argparse
+import sqlite3
+import sys
+import zlib
+
+# Text shorter than this many characters is always stored as plain TEXT
+COMPRESSION_THRESHOLD = 512
+
+# zlib level: 6 is zlib's default balance of speed and size
+COMPRESSION_LEVEL = 6
+
+# First byte of a compressed value, naming the codec (plain values are TEXT, not BLOB)
+ZLIB_MARKER = b'\x01'
+
+# (table, column) pairs whose values may be compressed
+COMPRESSED_COLUMNS = [('journal_entries', 'content'), ('journal_revisions', 'payload'), ('goals', 'description')]
+
+
+def encode_text(text):
+    """Value to store for text: a marker-prefixed zlib BLOB when that is smaller, else the text"""
+    if text is None or len(text) < COMPRESSION_THRESHOLD:
+        return text
+    compressed = ZLIB_MARKER + zlib.compress(text.encode('utf-8'), COMPRESSION_LEVEL)
+    # Short or already dense text can come out larger; it stays plain
+    return compressed if len(compressed) < len(text.encode('utf-8')) else text
+
+
+def decode_text(value):
+    """Text of a stored value, compressed or not"""
+    if not isinstance(value, bytes):
+        return value
+    if value[:1] == ZLIB_MARKER:
+        return zlib.decompress(value[1:]).decode('utf-8')
+    raise ValueError(f"Unknown text codec marker {value[:1]!r}")
+
+
+def register(conn):
+    """Make decode_text() available to the app's SQL queries on a connection.
+
+    Only queries use it: the schema (triggers included) must keep working
+    on connections that never registered it, such as the sqlite3 shell.
+    """
+    conn.create_function("decode_text", 1, decode_text, deterministic=True)
+
+
+def compress_column(cursor, table, column, batch_size=500):
+    """Re-encode every plain value of table.column long enough to compress; returns rows rewritten"""
+    rewritten, last_id = 0, 0
+    while True:
+        cursor.execute(f'''
+            SELECT id, {column} FROM {table}
+            WHERE id > ? AND typeof({column}) = 'text' AND length({column}) >= ?
+            ORDER BY id LIMIT ?
+        ''', (last_id, COMPRESSION_THRESHOLD, batch_size))
+        rows = cursor.fetchall()
+        if not rows:
+            return rewritten
+        last_id = rows[-1][0]
+        updates = [(encoded, row_id) for row_id, text in rows
+                   if (encoded := encode_text(text)) is not text]
+        cursor.executemany(f'UPDATE {table} SET {column} = ? WHERE id = ?', updates)
+        rewritten += len(updates)
+
+
+def compression_report(cursor):
+    """Per column: rows, compressed rows, and stored vs plain bytes"""
+    report = []
+    for table, column in COMPRESSED_COLUMNS:
+        cursor.execute(f'''
+            SELECT count(*),
+                   count(CASE WHEN typeof({column}) = 'blob' THEN 1 END),
+                   coalesce(sum(length(CAST({column} AS BLOB))), 0),
+                   coalesce(sum(length(CAST(decode_text({column}) AS BLOB))), 0)
+            FROM {table}
+        ''')
+        rows, compressed, stored_bytes, plain_bytes = cursor.fetchone()
+        report.append({
+            'column': f"{table}.{column}", 'rows': rows, 'compressed_rows': compressed,
+            'stored_bytes': stored_bytes, 'plain_bytes': plain_bytes,
+        })
+    return report
+
+
+def format_report(report):
+    """Human-readable lines of a compression_report()"""
+    lines = []
+    for entry in report:
+        saved = entry['plain_bytes'] - entry['stored_bytes']
+        percent = 100 * saved / entry['plain_bytes'] if entry['plain_bytes'] else 0
+        lines.append(f"{entry['column']}: {entry['compressed_rows']}/{entry['rows']} rows compressed, "
+                     f"{entry['plain_bytes'] / 1e6:.2f} MB -> {entry['stored_bytes'] / 1e6:.2f} MB "
+                     f"({percent:.0f}% saved)")
+    return lines
+
+
+def main():
+    """Command line entry point: report how much compression saves, optionally reclaiming the space"""
+    from db import transaction
+    from migrations import ensure_schema
+
+    parser = argparse.ArgumentParser(description="Report space saved by compressing journals and descriptions")
+    parser.add_argument("--vacuum", action="store_true",
+                        help="rewrite the database file so the freed pages go back to the disk")
+    args = parser.parse_args()
+
+    ensure_schema()
+    with transaction() as cursor:
+        for line in format_report(compression_report(cursor)):
+            print(line)
+    if args.vacuum:
+        # VACUUM cannot run inside a transaction, so it gets a connection of its own
+        from db import current_database
+        conn = sqlite3.connect(current_database(), isolation_level=None)
+        try:
+            conn.execute("VACUUM")
+        finally:
+            conn.close()
+        print("✅ Database file compacted.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())